@@ -0,0 +1,53 @@
+"""
+Wake-up precision of the playback clock: plain time.sleep() against the
+hybrid sleep/spin G6Clock, with and without busy mode.
+
+    python -m bench.clock [events] [interval_ms]
+"""
+import sys
+import time
+
+from g6.clock import G6Clock
+from g6.const import G6_CLOCK_BUCKETS
+from g6.stats import G6Histogram
+
+
+def plain_sleep(count, interval):
+    lateness = G6Histogram(G6_CLOCK_BUCKETS)
+    epoch = time.monotonic_ns()
+    for i in range(count):
+        deadline = epoch + int(i * interval * 1e9)
+        delta = deadline - time.monotonic_ns()
+        if delta > 0:
+            time.sleep(delta / 1e9)
+        lateness.record(max(0, time.monotonic_ns() - deadline))
+    return lateness
+
+
+def g6_clock(count, interval, busy):
+    clock = G6Clock(busy=busy)
+    clock.start()
+    for i in range(count):
+        clock.wait_until(i * interval)
+    return clock.lateness
+
+
+def report(name, hist):
+    stats = hist.as_dict()
+    print(
+        f"{name:<12} mean={stats['mean_us']:8.1f}us  p50<={stats['p50_us']:6.0f}us  "
+        f"p99<={stats['p99_us']:6.0f}us  max={stats['max_us']:8.1f}us"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    interval = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+
+    report("time.sleep", plain_sleep(count, interval))
+    report("G6Clock", g6_clock(count, interval, False))
+    report("G6Clock busy", g6_clock(count, interval, True))
+
+
+if __name__ == "__main__":
+    main()
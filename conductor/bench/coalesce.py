@@ -0,0 +1,77 @@
+"""
+Bus traffic for a chord-heavy score on the simulated bus, with every event
+in its own frame ("none") against events for a node coalesced into shared
+frames. Lights are never dropped, so every run delivers the same events;
+a run that didn't is marked.
+
+    python -m bench.coalesce [nodes] [quantum_ms ...]
+"""
+import sys
+
+from g6.const import G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT
+from g6.sim import G6SimBus, G6SimNode
+from player import LookaheadPlayer, ScoreEvent
+
+
+CHORDS = 40
+CHORD_INTERVAL = 120
+CHORD_SIZE = 3
+# Room for a single command, so no frame is shared
+SINGLE_FRAME = 12
+
+
+def make_score(nodes):
+    # Every note is lit as it plays, so a chord is 2 * CHORD_SIZE commands
+    events = []
+    for i in range(CHORDS):
+        t = i * CHORD_INTERVAL
+        for node in nodes:
+            for note in range(CHORD_SIZE):
+                events.append(ScoreEvent(t, node, G6_CMD_GRAPHENE_LIGHT, 0, 60 + note, 255))
+                events.append(ScoreEvent(t, node, G6_CMD_GRAPHENE_DOWN, 0, 60 + note, 100))
+                events.append(ScoreEvent(t + CHORD_INTERVAL // 2, node, G6_CMD_GRAPHENE_UP, 0, 60 + note, 0))
+    events.sort(key=lambda i: i.time)
+    return events
+
+
+def run(bus, g6, quantum):
+    for i in bus.nodes:
+        i.events.clear()
+    g6.stats.reset()
+
+    events = make_score(g6.nodes)
+    if quantum is None:
+        player = LookaheadPlayer(g6.clock, quantum=0, max_frame=SINGLE_FRAME)
+    else:
+        player = LookaheadPlayer(g6.clock, quantum=quantum)
+    g6.start_scheduler().light_limit = len(events)
+    player.play(events, g6.nodes)
+    g6.stop_scheduler()
+
+    counters = g6.stats.counters
+    acks = sum(
+        hist.count for (name, _), hist in g6.stats.histograms.items() if name in ("write_ack", "burst_ack")
+    )
+    received = sum(len(i.events) for i in bus.nodes)
+    return counters.get("frames_out", 0), counters.get("bytes_out", 0), acks, received, len(events)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    quanta = [None] + ([float(i) / 1000 for i in sys.argv[2:]] or [0.0, 0.005])
+
+    bus = G6SimBus([G6SimNode(seed=i) for i in range(size)])
+    g6 = bus.master()
+    g6.enumerate_bus()
+
+    print(f"{'quantum':>8} {'frames':>7} {'bytes':>7} {'acks':>6} {'events':>7}")
+    for quantum in quanta:
+        frames, sent, acks, received, expected = run(bus, g6, quantum)
+        label = "none" if quantum is None else f"{quantum * 1000:.0f}ms"
+        mark = "" if received == expected else f"  incomplete, {expected} sent"
+        print(f"{label:>8} {frames:>7} {sent:>7} {acks:>6} {received:>7}{mark}")
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Frame encoding microbenchmark: G6PacketOut with struct-packed command tuples
+against the preallocated G6EventEncoder.
+
+    python -m bench.encode [frames]
+"""
+import sys
+import time
+
+from g6 import G6Node
+from g6.const import G6_CMD_GRAPHENE_DOWN
+from g6.packet import G6PacketOut, G6EventEncoder
+
+
+def bench(name, fn, count):
+    start = time.perf_counter()
+    fn(count)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<14} {count / elapsed:>12,.0f} frames/s  ({elapsed / count * 1e9:7.0f}ns/frame)")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    encoder = G6EventEncoder()
+
+    # Both paths must agree, including frames that need escaping
+    for t in (0, 0xE0, 0xD0D0, 0x12345678):
+        for note in (0x50, 0xD0, 0xE0):
+            expected = bytes(G6PacketOut(3, G6Node.cmd_note_down(t, 1, note, 100)))
+            assert bytes(encoder.encode(3, G6_CMD_GRAPHENE_DOWN, t, 1, note, 100)) == expected
+
+    def packet_out(n):
+        for i in range(n):
+            bytes(G6PacketOut(3, G6Node.cmd_note_down(i, 1, 60, 100)))
+
+    def event_encoder(n):
+        encode = encoder.encode
+        for i in range(n):
+            encode(3, G6_CMD_GRAPHENE_DOWN, i, 1, 60, 100)
+
+    before = bench("G6PacketOut", packet_out, count)
+    after = bench("G6EventEncoder", event_encoder, count)
+    print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
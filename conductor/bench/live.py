@@ -0,0 +1,86 @@
+"""
+Latency of live MIDI pass-through on the simulated bus: raw NoteOn/NoteOff
+datagrams go to a LivePlayer over UDP, and each note is timed from the
+moment it was sent until the node it was routed to received it. "forward"
+is the host's share of that, from the datagram being read to the frame
+being handed to the bus.
+
+    python -m bench.live [notes] [interval_ms]
+"""
+import socket
+import statistics
+import sys
+import threading
+import time
+
+from g6.const import G6_CMD_GRAPHENE_DOWN, G6_FEATURE_NOTE_CHANNEL, G6_FEATURE_EOF
+from g6.sim import G6SimBus, G6SimNode
+from player import LivePlayer, Router, open_source
+
+
+# What a Musical Steppers board describes: one note channel covering
+# everything, with G6_POLYPHONY saying it has four voices
+STEPPERS = "Musical Steppers;Ver2.00;"
+STEPPERS_FEATURES = bytes([G6_FEATURE_NOTE_CHANNEL, 0, 0, 255, G6_FEATURE_EOF])
+
+
+def summary(values):
+    values = sorted(values)
+    p99 = values[max(0, int(len(values) * 0.99) - 1)]
+    return f"p50={statistics.median(values) * 1e6:7.1f}us p99={p99 * 1e6:7.1f}us max={values[-1] * 1e6:7.1f}us"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    interval = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    bus = G6SimBus([G6SimNode(STEPPERS, STEPPERS_FEATURES, seed=i) for i in range(2)])
+    g6 = bus.master()
+    g6.enumerate_bus()
+    g6.start_scheduler()
+    g6.stats.reset()
+
+    player = LivePlayer(Router(g6.nodes))
+    source = open_source("udp:127.0.0.1:0")
+    thread = threading.Thread(target=player.serve, args=(source, 0.01), daemon=True)
+    thread.start()
+
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = []
+    for i in range(count):
+        note = 36 + i % 48
+        # Only the first message carries a status byte; after that it's
+        # running status, NoteOn with velocity 0 for the note off
+        down = bytes([note, 100]) if i else bytes([0x90, note, 100])
+        sent.append(time.monotonic())
+        out.sendto(down, source.getsockname())
+        time.sleep(interval / 2)
+        out.sendto(bytes([note, 0]), source.getsockname())
+        time.sleep(interval / 2)
+
+    time.sleep(0.2)
+    player.stop()
+    thread.join()
+    g6.stop_scheduler()
+
+    # Notes are far enough apart to arrive in the order they were sent
+    downs = sorted(
+        (event.at for sim in bus.nodes for event in sim.events if event.cmd == G6_CMD_GRAPHENE_DOWN and event.b)
+    )
+    arrival = [at - t for at, t in zip(downs, sent)]
+
+    print(f"{count} notes, {len(downs)} arrived, {player.rejected} rejected")
+    for (name, handle), hist in sorted(g6.stats.histograms.items()):
+        if name != "live_forward":
+            continue
+        hist = hist.as_dict()
+        print(
+            f"forward[{handle}]  n={hist['count']:<5} mean={hist['mean_us']:7.1f}us "
+            f"p50<={hist['p50_us']:.0f}us p99<={hist['p99_us']:.0f}us max={hist['max_us']:.0f}us"
+        )
+    print(f"arrival     {summary(arrival)}")
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
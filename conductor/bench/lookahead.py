@@ -0,0 +1,87 @@
+"""
+How closely notes sound to the score on the simulated bus, sending events
+as they are due against streaming them ahead for the nodes to fire. The
+first node asks for a lead of SLOW_LEAD ms, like a solenoid that takes
+that long to strike, which the player has to make up for.
+
+    python -m bench.lookahead [nodes] [window_ms ...]
+"""
+import statistics
+import sys
+
+from g6.const import (
+    G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT, G6_FEATURE_OFFSET,
+    G6_FEATURE_EOF
+)
+from g6.sim import G6SimBus, G6SimNode, SIM_DEFAULT_FEATURES
+from player import LookaheadPlayer, ScoreEvent
+
+
+CHORDS = 40
+CHORD_INTERVAL = 100
+CHORD_SIZE = 2
+SLOW_LEAD = 30
+
+
+def make_score(nodes):
+    # Dense chords on every node at once, each note lit as it plays
+    events = []
+    for i in range(CHORDS):
+        t = i * CHORD_INTERVAL
+        for node in nodes:
+            for note in range(CHORD_SIZE):
+                events.append(ScoreEvent(t, node, G6_CMD_GRAPHENE_LIGHT, 0, 60 + note, 255))
+                events.append(ScoreEvent(t, node, G6_CMD_GRAPHENE_DOWN, 0, 60 + note, 100))
+                events.append(ScoreEvent(t + CHORD_INTERVAL // 2, node, G6_CMD_GRAPHENE_UP, 0, 60 + note, 0))
+    events.sort(key=lambda i: i.time)
+    return events
+
+
+def run(bus, g6, window):
+    for i in bus.nodes:
+        i.events.clear()
+
+    player = LookaheadPlayer(g6.clock, window)
+    g6.start_scheduler()
+    player.play(make_score(g6.nodes), g6.nodes)
+    g6.stop_scheduler()
+
+    # Strikes land `requested` after the node fires; compare against the
+    # score time each stamp was made from
+    epoch = g6.clock.epoch
+    error = []
+    for sim, node in zip(bus.nodes, g6.nodes):
+        requested = (node.offset - node.latency) * 1000
+        for event in sim.events:
+            if event.cmd != G6_CMD_GRAPHENE_DOWN:
+                continue
+            t = event.time
+            if window:
+                t += requested - player.shift[node]
+            error.append((event.fire - epoch) * 1000 + requested - t)
+    return error
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    windows = [float(i) / 1000 for i in sys.argv[2:]] or [0.0, 0.1, 0.2]
+
+    slow = SIM_DEFAULT_FEATURES[:-1] + bytes([G6_FEATURE_OFFSET, 0, SLOW_LEAD, 0, G6_FEATURE_EOF])
+    nodes = [G6SimNode(features=slow, seed=0)] + [G6SimNode(seed=i) for i in range(1, size)]
+    bus = G6SimBus(nodes)
+    g6 = bus.master()
+    g6.enumerate_bus()
+
+    print(f"{'window':>8} {'error p50':>10} {'error p99':>10} {'error max':>10} {'spread':>8}")
+    for window in windows:
+        error = sorted(run(bus, g6, window))
+        p99 = error[int(len(error) * 0.99) - 1]
+        print(
+            f"{window * 1000:>6.0f}ms {statistics.median(error):>8.2f}ms {p99:>8.2f}ms "
+            f"{error[-1]:>8.2f}ms {error[-1] - error[0]:>6.2f}ms"
+        )
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Gapless playback of a playlist on the simulated bus. A few short pieces are
+written out as MIDI files and played back to back. Each ends with half a
+beat of rest after its last note off and they are played with no gap, so
+the next piece's first note falls a beat after the last one's only if the
+rest is kept. The error in that spacing as the nodes fire it is the gap.
+
+    python -m bench.playlist [pieces] [notes]
+"""
+import os
+import statistics
+import sys
+import tempfile
+
+from g6.const import G6_CMD_GRAPHENE_DOWN
+from g6.sim import G6SimBus, G6SimNode
+from player import Playlist
+
+
+BEAT = 100
+TPQN = 480
+
+
+def varlen(value):
+    out = bytearray([value & 0x7f])
+    value >>= 7
+    while value:
+        out.insert(0, 0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(out)
+
+
+def make_midi(name, notes):
+    # Format 0 at 120 bpm (500ms a quarter note): a note every BEAT ms,
+    # each held for half of it, then half a beat of rest before the end
+    ticks = TPQN * BEAT // 500 // 2
+    track = bytearray(b"\x00\xff\x03" + varlen(len(name)) + name.encode("latin-1"))
+    for i in range(notes):
+        track += varlen(0 if i == 0 else ticks) + bytes([0x90, 60 + i % 12, 100])
+        track += varlen(ticks) + bytes([0x80, 60 + i % 12, 0])
+    track += varlen(ticks) + b"\xff\x2f\x00"
+    header = b"MThd" + (6).to_bytes(4, "big") + (0).to_bytes(2, "big") + (1).to_bytes(2, "big")
+    header += TPQN.to_bytes(2, "big")
+    return header + b"MTrk" + len(track).to_bytes(4, "big") + bytes(track)
+
+
+def main():
+    pieces = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    notes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    bus = G6SimBus([G6SimNode(seed=0)])
+    g6 = bus.master()
+    g6.enumerate_bus()
+    g6.start_scheduler()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(pieces):
+            path = os.path.join(tmp, f"piece{i}.mid")
+            with open(path, "wb") as f:
+                f.write(make_midi(g6.nodes[0].name, notes))
+            files.append(path)
+        Playlist(g6, files, gap=0, cache=None).play()
+    g6.stop_scheduler()
+
+    # Node clock fire times of every strike, in order; within a piece and
+    # across a boundary they should all be BEAT apart
+    fires = sorted(e.fire for e in bus.nodes[0].events if e.cmd == G6_CMD_GRAPHENE_DOWN and e.b)
+    spacing = [(b - a) * 1000 - BEAT for a, b in zip(fires, fires[1:])]
+    boundaries = [spacing[i * notes - 1] for i in range(1, pieces)]
+    within = [s for i, s in enumerate(spacing) if (i + 1) % notes]
+    print(f"{len(fires)} strikes over {pieces} pieces")
+    print(f"within a piece   mean error {statistics.mean(within):+.2f}ms, max {max(map(abs, within)):.2f}ms")
+    print(f"across a boundary errors {', '.join(f'{i:+.2f}ms' for i in boundaries)}")
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Hardware-free benchmarks on the simulated G6 bus: enumeration time, bridge
+throughput and playback jitter at a few orchestra sizes.
+
+    python -m bench.sim [nodes ...]
+"""
+import statistics
+import sys
+import time
+
+from g6 import G6Node
+from g6.const import G6_CMD_GRAPHENE_DOWN
+from g6.packet import G6PacketOut
+from g6.sim import G6SimBus
+
+
+THROUGHPUT_FRAMES = 200
+JITTER_EVENTS = 200
+JITTER_INTERVAL = 0.01
+
+
+def bench_enumerate(bus):
+    g6 = bus.master()
+    start = time.perf_counter()
+    g6.enumerate_bus()
+    return g6, time.perf_counter() - start
+
+
+def bench_throughput(g6):
+    address = g6.nodes[0].address
+    frames = [G6PacketOut(address, G6Node.cmd_light(i, 0, i & 0x7f, 0)) for i in range(THROUGHPUT_FRAMES)]
+
+    start = time.perf_counter()
+    for i in frames:
+        g6.write(i)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    g6.write_many(frames)
+    many = time.perf_counter() - start
+
+    return THROUGHPUT_FRAMES / single, THROUGHPUT_FRAMES / many
+
+
+def bench_jitter(bus, g6):
+    for i in bus.nodes:
+        i.events.clear()
+
+    g6.start_scheduler()
+    clock = g6.clock
+    clock.start()
+    for i in range(JITTER_EVENTS):
+        node = g6.nodes[i % len(g6.nodes)]
+        clock.wait_until(i * JITTER_INTERVAL)
+        node.note_down(int(i * JITTER_INTERVAL * 1000), 0, 60, 100)
+    g6.stop_scheduler()
+
+    lateness = [
+        (event.at - clock.epoch - event.time / 1000) * 1000
+        for node in bus.nodes for event in node.events
+        if event.cmd == G6_CMD_GRAPHENE_DOWN
+    ]
+    return lateness
+
+
+def main():
+    sizes = [int(i) for i in sys.argv[1:]] or [1, 16, 64]
+
+    results = []
+    for size in sizes:
+        bus = G6SimBus(count=size)
+        g6, enum_time = bench_enumerate(bus)
+        single, many = bench_throughput(g6)
+        lateness = bench_jitter(bus, g6)
+        bus.close()
+        results.append((size, enum_time, single, many, lateness))
+
+    print()
+    print(f"{'nodes':>5} {'enumerate':>10} {'write/s':>9} {'many/s':>9} {'late p50':>9} {'late p99':>9} {'late max':>9}")
+    for size, enum_time, single, many, lateness in results:
+        lateness.sort()
+        p99 = lateness[int(len(lateness) * 0.99) - 1]
+        print(
+            f"{size:>5} {enum_time:>9.2f}s {single:>9.1f} {many:>9.1f} "
+            f"{statistics.median(lateness):>7.2f}ms {p99:>7.2f}ms {lateness[-1]:>7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
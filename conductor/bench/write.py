@@ -0,0 +1,58 @@
+"""
+Bridge write throughput: per-frame G6Com.write against pipelined write_many.
+
+Frames are addressed to a node id that nothing on the bus answers to, so the
+benchmark only exercises the bridge and leaves the instruments alone.
+
+    python -m bench.write [port|sim] [frames]
+"""
+import sys
+import time
+
+from g6 import G6Master, G6Node
+from g6.packet import G6PacketOut
+from g6.sim import G6SimBus
+
+
+BENCH_ADDRESS = 0xFE
+
+
+def make_frames(count):
+    return [
+        G6PacketOut(BENCH_ADDRESS, G6Node.cmd_light(i, 0, i & 0x7f, 0))
+        for i in range(count)
+    ]
+
+
+def bench(name, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {count} frames in {elapsed * 1000:8.2f}ms  ({count / elapsed:8.1f} frames/s)")
+    return elapsed
+
+
+def main():
+    port = sys.argv[1] if len(sys.argv) > 1 else None
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    if port == "sim":
+        g6 = G6SimBus().master()
+    else:
+        g6 = G6Master(port)
+    frames = make_frames(count)
+
+    def per_frame():
+        for i in frames:
+            g6.write(i)
+
+    def pipelined():
+        g6.write_many(frames)
+
+    single = bench("write", per_frame, count)
+    many = bench("write_many", pipelined, count)
+    print(f"Speedup: {single / many:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
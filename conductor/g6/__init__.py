@@ -1,2 +1,5 @@
 from .node import G6Node
+from .capabilities import G6NodeCapabilities
 from .master import G6Master
+from .cluster import G6Cluster
+from .aio import AsyncG6Master, AsyncG6Node
@@ -0,0 +1,396 @@
+import asyncio
+import collections
+import math
+import time
+
+from .const import (
+    G6_TIMEOUT, G6_RESEND_RETRIES, G6_STATUS_OK, G6_STATUS_OVERFLOW, G6_SYNC, G6_REPORT_OK,
+    G6_CMD_GRAPHENE_PING, G6_BYTE_TIMEOUT, G6_BRIDGE_BUFFER
+)
+from .error import G6Error, G6StatusNack, G6ReportNack, G6ChecksumError
+from .master import ReadAnswers, read_requests, _dst
+from .packet import G6PacketOut, G6FrameDecoder
+from .node import G6Node
+
+
+# How long the reader thread blocks before checking whether it should stop
+AIO_POLL_INTERVAL = 0.02
+# Slack on top of the bridge's own timeout before we give up on an answer
+AIO_HW_TIMEOUT = 0.1
+
+
+class _AckWait:
+    __slots__ = ("future", "size")
+
+    def __init__(self, future):
+        self.future = future
+        self.size = 0
+
+    def feed(self, byte):
+        if byte == G6_SYNC:
+            _resolve(self.future, None)
+        else:
+            _reject(self.future, TimeoutError())
+        return True
+
+
+class _ReadWait:
+    __slots__ = ("future", "size", "answers")
+
+    def __init__(self, count, future):
+        self.future = future
+        self.size = 0
+        self.answers = ReadAnswers(count)
+
+    def feed(self, byte):
+        if not self.answers.feed(byte):
+            return False
+        if self.answers.timed_out:
+            _reject(self.future, TimeoutError())
+        else:
+            _resolve(self.future, self.answers.data)
+        return True
+
+
+def _resolve(future, result):
+    if future is not None and not future.done():
+        future.set_result(result)
+
+
+def _reject(future, exc):
+    if future is None:
+        print(f"W: Unawaited bridge write failed ({exc!r})")
+    elif not future.done():
+        future.set_exception(exc)
+
+
+class AsyncG6Com:
+    """
+    asyncio view of a G6Com. Requests are written to the port as the
+    bridge's buffer makes room for them, and a reader task matches the
+    bridge's in-order answers against a FIFO of futures, so nothing ever
+    blocks the event loop waiting for the wire.
+    """
+
+    def __init__(self, com, window=G6_BRIDGE_BUFFER):
+        self.com = com
+        self.ser = com.com
+        self.timeout = com.timeout
+        self.window = window
+        self.decoder = G6FrameDecoder()
+        self._expect = collections.deque()
+        # Requests waiting for room in the bridge's buffer, and the bytes of
+        # those it hasn't answered yet
+        self._backlog = collections.deque()
+        self._in_flight = 0
+        # Frames written and not yet acked, and when the last ack came
+        self.unacked = 0
+        self.last_ack = 0.0
+        self._reader = None
+        self._running = False
+        self._last_rx = 0.0
+        self._ser_timeout = None
+
+    async def start(self):
+        self._ser_timeout = self.ser.timeout
+        self.ser.timeout = AIO_POLL_INTERVAL
+        self._running = True
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def close(self):
+        self._running = False
+        if self._reader is not None:
+            await self._reader
+            self._reader = None
+        self._fail_all(ConnectionError("bridge closed"))
+        self.ser.timeout = self._ser_timeout
+
+    def _submit(self, data, wait):
+        wait.size = len(data)
+        if self._backlog or (self._in_flight and self._in_flight + wait.size > self.window):
+            self._backlog.append((data, wait))
+        else:
+            self._send(data, wait)
+
+    def _send(self, data, wait):
+        if not self._expect:
+            self._last_rx = time.monotonic()
+        self._expect.append(wait)
+        self._in_flight += wait.size
+        self.ser.write(data)
+
+    def _done(self, wait):
+        self._in_flight -= wait.size
+        if isinstance(wait, _AckWait):
+            self.unacked -= 1
+            self.last_ack = time.monotonic()
+        backlog = self._backlog
+        while backlog and (not self._in_flight or self._in_flight + backlog[0][1].size <= self.window):
+            self._send(*backlog.popleft())
+
+    def write(self, data, wait=True):
+        data = bytes(data)
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self.unacked += 1
+        self._submit(
+            b"\0" + bytes([len(data) >> 8, len(data) & 0xff]) + data,
+            _AckWait(future)
+        )
+        return future
+
+    async def read_bulk(self, n, timeout=None, first=None):
+        # As G6Com.read_bulk; a batch that times out ends the read
+        if n <= 0:
+            return bytearray()
+        timeout = self.timeout if timeout is None else timeout
+        first = timeout if first is None else first
+        loop = asyncio.get_running_loop()
+        data = bytearray()
+        for request in read_requests(n, timeout, first):
+            future = loop.create_future()
+            self._submit(request, _ReadWait(len(request) // 3, future))
+            data += await future
+        return data
+
+    async def read_packet(self):
+        decoder = self.decoder
+        bad_frames = decoder.bad_frames
+        try:
+            while True:
+                if decoder.in_frame:
+                    chunk = await self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT)
+                else:
+                    chunk = await self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT, self.timeout)
+                packets = decoder.feed(chunk)
+                if packets:
+                    return packets[0]
+                if decoder.bad_frames != bad_frames:
+                    raise G6ChecksumError()
+        except TimeoutError:
+            decoder.reset()
+            raise
+
+    async def drain(self, wait=0):
+        # As G6Com.drain: answers nobody waited for, the first probe waiting
+        # up to `wait` seconds
+        packets = []
+        decoder = self.decoder
+        wait = math.ceil(wait * 1000) / 1000
+        try:
+            while True:
+                if decoder.in_frame:
+                    chunk = await self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT)
+                else:
+                    chunk = await self.read_bulk(1, wait)
+                    wait = 0
+                packets += decoder.feed(chunk)
+        except TimeoutError:
+            decoder.reset()
+            return packets
+
+    def _read_chunk(self):
+        return self.ser.read(max(1, self.ser.in_waiting))
+
+    async def _read_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            chunk = await loop.run_in_executor(None, self._read_chunk)
+            if chunk:
+                self._last_rx = time.monotonic()
+                for byte in chunk:
+                    if not self._expect:
+                        print(f"W: Unexpected byte from bridge {byte:02x}")
+                        continue
+                    if self._expect[0].feed(byte):
+                        self._done(self._expect.popleft())
+            elif self._expect and time.monotonic() - self._last_rx > self.timeout + AIO_HW_TIMEOUT:
+                print("HW timeout!")
+                self._fail_all(TimeoutError())
+
+    def _fail_all(self, exc):
+        while self._expect:
+            wait = self._expect.popleft()
+            _reject(wait.future, exc)
+        while self._backlog:
+            _, wait = self._backlog.popleft()
+            _reject(wait.future, exc)
+        self._in_flight = 0
+        self.unacked = 0
+
+
+class AsyncG6Master:
+    """
+    asyncio front end over an enumerated G6Master. Fire-and-forget writes go
+    out as soon as the bridge has room; exchanges are serialised among
+    themselves (responses carry no source address) but never hold up plain
+    writes. Batching, resends and stray refusals are handled as G6Master
+    does, on its state. The synchronous master must not be used while this
+    is running.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.com = AsyncG6Com(master.com)
+        self.nodes: list[AsyncG6Node] = [AsyncG6Node(self, i) for i in master.nodes]
+        self._exchange_lock = asyncio.Lock()
+        self._drainer = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        await self.com.start()
+
+    async def close(self):
+        if self._drainer is not None:
+            await self._drainer
+        await self.com.close()
+
+    def write(self, data: bytes, wait=False):
+        future = self._write(bytes(data), wait=wait)
+        # Nothing else looks for refusals between exchanges
+        if self._drainer is None and self.master._drain_due():
+            self._drainer = asyncio.get_running_loop().create_task(self._drain_soon())
+        return future
+
+    def _write(self, data, tries=0, wait=False):
+        # As G6Master._write
+        master = self.master
+        if not master._unanswered:
+            master._unanswered_since = time.monotonic()
+        master._unanswered.append((_dst(data), data, tries))
+        return self.com.write(data, wait)
+
+    async def _drain_soon(self):
+        try:
+            async with self._exchange_lock:
+                await self._drain()
+        finally:
+            self._drainer = None
+
+    async def _drain(self):
+        # As G6Master._drain. Frames written while it waits are left for the
+        # next time. Caller holds the exchange lock.
+        master = self.master
+        resend = True
+        while resend and master._unanswered:
+            count = len(master._unanswered)
+            if self.com.unacked:
+                # The bridge times the probe from when it gets to it, which
+                # is after the frames ahead of it
+                wait = master.reply_window()
+            else:
+                master._last_write = self.com.last_ack
+                wait = master.reply_wait()
+            resend = master._refused(await self.com.drain(wait), count)
+            await self._resend(resend)
+
+    async def _resend(self, frames):
+        master = self.master
+        for address, frame, tries in frames:
+            await asyncio.sleep(master.flow.backoff(address))
+            master.stats.incr("redo")
+            self._write(frame, tries)
+
+    async def exchange(self, data: bytes):
+        data = bytes(data)
+        async with self._exchange_lock:
+            await self._drain()
+            await self.com.write(data)
+            try:
+                return await self._answer()
+            except (G6ChecksumError, G6StatusNack) as e:
+                error = e
+            # As G6Master._recover
+            for _ in range(G6_RESEND_RETRIES):
+                frame, delay = self.master._recovery(data, error)
+                if delay:
+                    await asyncio.sleep(delay)
+                await self.com.write(frame)
+                try:
+                    return await self._answer()
+                except (G6ChecksumError, G6StatusNack) as e:
+                    error = e
+            raise error
+
+    async def _answer(self):
+        # Plain frames may have gone out around the request, and a node
+        # refusing one of them answers OVERFLOW with no address. Then every
+        # answer up to the reply window is read: the request has exactly one,
+        # and anything else is a refusal. Caller holds the exchange lock.
+        master = self.master
+        count = len(master._unanswered)
+        if not count:
+            return await self.wait_resp()
+
+        self.com.timeout = G6_TIMEOUT
+        decoder = self.com.decoder
+        packets = [await self.com.read_packet()]
+        bad_frames = decoder.bad_frames
+        packets += await self.com.drain(master.reply_window())
+        answers = [i for i in packets if i.status != G6_STATUS_OVERFLOW] or packets[:1]
+        if len(answers) > 1:
+            master._refused([], count)
+            raise G6Error("More answers than requests")
+        packets.remove(answers[0])
+        await self._resend(master._refused(packets, count))
+        if decoder.bad_frames != bad_frames:
+            # The one that was damaged may have been the answer
+            raise G6ChecksumError()
+        if answers[0].status != G6_STATUS_OK:
+            raise G6StatusNack(answers[0])
+        return answers[0]
+
+    async def wait_resp(self, timeout=G6_TIMEOUT):
+        self.com.timeout = timeout
+        pkt = await self.com.read_packet()
+        if pkt.status != G6_STATUS_OK:
+            raise G6StatusNack(pkt)
+        return pkt
+
+
+class AsyncG6Node:
+    def __init__(self, master: AsyncG6Master, node: G6Node):
+        self.master = master
+        self.node = node
+        self.address = node.address
+        self._last = None
+
+    def __getattr__(self, name):
+        # Identity, features and the cmd_* builders come from the sync node
+        return getattr(self.node, name)
+
+    def send(self, *cmds: tuple[int, bytes]):
+        self.master.write(G6PacketOut(self.address, *cmds))
+
+    async def exchange(self, *cmds: tuple[int, bytes]):
+        self._last = bytes(G6PacketOut(self.address, *cmds))
+        return await self.master.exchange(self._last)
+
+    async def exchange_one(self, cmd: tuple[int, bytes]):
+        response = await self.exchange(cmd)
+        if response.data[0] != G6_REPORT_OK:
+            raise G6ReportNack()
+        return response.data[1:]
+
+    async def ping(self):
+        return await self.exchange((G6_CMD_GRAPHENE_PING, b""))
+
+    def note_down(self, time, channel, note, vel):
+        self.send(G6Node.cmd_note_down(time, channel, note, vel))
+
+    def note_up(self, time, channel, note, vel):
+        self.send(G6Node.cmd_note_up(time, channel, note, vel))
+
+    def light(self, time, channel, light, value):
+        self.send(G6Node.cmd_light(time, channel, light, value))
+
+    async def control(self, time, channel, control, value):
+        await self.exchange_one(G6Node.cmd_control(time, channel, control, value))
+
+    def __repr__(self):
+        return f"<AsyncG6Node: {self.address} {self.ioident}>"
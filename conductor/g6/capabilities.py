@@ -0,0 +1,100 @@
+import struct
+from types import MappingProxyType
+
+from .const import (
+    G6_FEATURE_EOF, G6_FEATURE_NOTE_CHANNEL, G6_FEATURE_LIGHT_CHANNEL, G6_FEATURE_CONTROL_CHANNEL,
+    G6_FEATURE_OFFSET
+)
+
+
+# Every feature is an opcode and three bytes of arguments
+_FEATURE = struct.Struct(">BBBB")
+_OFFSET = struct.Struct(">hx")
+
+_CHANNEL_TYPES = {
+    G6_FEATURE_NOTE_CHANNEL: "note",
+    G6_FEATURE_LIGHT_CHANNEL: "light",
+    G6_FEATURE_CONTROL_CHANNEL: "control",
+}
+
+
+class G6NodeCapabilities:
+    """
+    What a node's feature descriptor says it can do, decoded once. Channel
+    tables map channel -> (min, max), `notes` is a bitmap of every note any
+    note channel can play, and `offset` is the requested lead in ms
+    (`has_offset` says whether the node declared one at all). Fields can't
+    be changed after decoding.
+    """
+
+    __slots__ = (
+        "note_channels", "light_channels", "control_channels", "notes", "offset", "has_offset", "unknown"
+    )
+
+    def __init__(self, note_channels, light_channels, control_channels, offset=None, unknown=()):
+        set_ = super().__setattr__
+        set_("note_channels", MappingProxyType(dict(note_channels)))
+        set_("light_channels", MappingProxyType(dict(light_channels)))
+        set_("control_channels", MappingProxyType(dict(control_channels)))
+        set_("offset", offset or 0)
+        set_("has_offset", offset is not None)
+        set_("unknown", tuple(unknown))
+
+        notes = 0
+        for low, high in self.note_channels.values():
+            if low <= high:
+                notes |= ((1 << (high - low + 1)) - 1) << low
+        set_("notes", notes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def decode(cls, features: bytes):
+        tables = {i: {} for i in _CHANNEL_TYPES}
+        offset = None
+        unknown = []
+        # Anything after the last whole feature can't be one
+        end = len(features) - len(features) % _FEATURE.size
+        for op, a, b, c in _FEATURE.iter_unpack(memoryview(features)[:end]):
+            if op == G6_FEATURE_EOF:
+                break
+            elif op in tables:
+                tables[op][a] = (b, c)
+            elif op == G6_FEATURE_OFFSET:
+                offset = _OFFSET.unpack(bytes((a, b, c)))[0]
+            else:
+                unknown.append((op, bytes((a, b, c))))
+        return cls(
+            tables[G6_FEATURE_NOTE_CHANNEL], tables[G6_FEATURE_LIGHT_CHANNEL],
+            tables[G6_FEATURE_CONTROL_CHANNEL], offset, unknown
+        )
+
+    def channels(self, type_):
+        return {
+            "note": self.note_channels, "light": self.light_channels, "control": self.control_channels,
+        }[type_]
+
+    def can_play(self, note, channel=None):
+        if channel is None:
+            return self.notes >> note & 1
+        low, high = self.note_channels.get(channel, (1, 0))
+        return low <= note <= high
+
+    def as_list(self):
+        # The shape G6Node.get_features() has always returned
+        ret = []
+        for type_ in _CHANNEL_TYPES.values():
+            for channel, (low, high) in self.channels(type_).items():
+                ret.append({"type": type_, "channel": channel, "min": low, "max": high})
+        if self.has_offset:
+            ret.append({"type": "offset", "offset": self.offset})
+        for op, data in self.unknown:
+            ret.append({"type": "?", "0": data[0], "1": data[1], "2": data[2]})
+        return ret
+
+    def __repr__(self):
+        return (
+            f"<G6NodeCapabilities notes={dict(self.note_channels)} "
+            f"lights={dict(self.light_channels)} offset={self.offset}ms>"
+        )
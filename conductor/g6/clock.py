@@ -0,0 +1,59 @@
+import time
+
+from .const import G6_CLOCK_SPIN, G6_CLOCK_BUCKETS
+from .stats import G6Histogram
+
+
+class G6Clock:
+    """
+    Playback clock shared by every bus in a performance, so that timestamps
+    sent to instruments on different buses are measured from the same start.
+
+    wait_until() sleeps until just short of the deadline and spins the rest
+    of the way, since an OS sleep can overshoot by a millisecond or more.
+    With busy=True it spins the whole time, which costs a core. How late
+    each wake-up was lands in `lateness`.
+    """
+
+    def __init__(self, spin=G6_CLOCK_SPIN, busy=False):
+        self.epoch_ns = time.monotonic_ns()
+        self.spin_ns = int(spin * 1e9)
+        self.busy = busy
+        self.lateness = G6Histogram(G6_CLOCK_BUCKETS)
+
+    @property
+    def epoch(self):
+        return self.epoch_ns / 1e9
+
+    def start(self, at=None):
+        # `at` is a time.monotonic() value, for starting several clocks together
+        self.epoch_ns = time.monotonic_ns() if at is None else int(at * 1e9)
+        self.lateness = G6Histogram(G6_CLOCK_BUCKETS)
+
+    def now(self):
+        return (time.monotonic_ns() - self.epoch_ns) / 1e9
+
+    def now_ns(self):
+        return time.monotonic_ns() - self.epoch_ns
+
+    def now_ms(self):
+        return (time.monotonic_ns() - self.epoch_ns) // 1_000_000
+
+    def wait_until(self, t):
+        return self.wait_until_ns(int(t * 1e9))
+
+    def wait_until_ns(self, t_ns):
+        # Returns how late we woke, in ns
+        deadline = self.epoch_ns + t_ns
+        if not self.busy:
+            coarse = deadline - self.spin_ns - time.monotonic_ns()
+            if coarse > 0:
+                time.sleep(coarse / 1e9)
+        now = time.monotonic_ns()
+        while now < deadline:
+            # sleep(0) hands the GIL over so the TX thread isn't starved
+            time.sleep(0)
+            now = time.monotonic_ns()
+        late = now - deadline
+        self.lateness.record(late)
+        return late
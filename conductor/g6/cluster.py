@@ -0,0 +1,89 @@
+import concurrent.futures
+
+from .error import G6Error
+from .master import G6Master, locate_ports
+from .clock import G6Clock
+from .node import G6Node
+
+
+class G6Cluster:
+    """
+    Drives every G6 bus attached to this machine as one orchestra. Each bus
+    keeps its own G6Master (and lock, and TX thread), so sends to nodes on
+    different buses never serialise on each other. Nodes are presented as one
+    table with handles of the form (bus index << 8) | address.
+    """
+
+    def __init__(self, ports=None, baud=115200, coms=None):
+        if coms is not None:
+            ports = [None] * len(coms)
+        elif ports is None:
+            ports = locate_ports()
+        if not ports:
+            raise G6Error("No serial ports found")
+        if coms is None:
+            coms = [None] * len(ports)
+
+        self.clock = G6Clock()
+        self.nodes: list[G6Node] = []
+        self._by_handle: dict[int, G6Node] = {}
+
+        # Opening a bridge waits on its bootloader, so do them all at once
+        with concurrent.futures.ThreadPoolExecutor(len(ports)) as pool:
+            self.buses: list[G6Master] = list(pool.map(
+                lambda port, com: G6Master(port, baud, clock=self.clock, com=com), ports, coms
+            ))
+
+    def _each(self, fn):
+        with concurrent.futures.ThreadPoolExecutor(len(self.buses)) as pool:
+            return list(pool.map(fn, self.buses))
+
+    def enumerate_bus(self, retries=5, cache=None):
+        self._each(lambda bus: bus.enumerate_bus(retries, cache))
+
+        self.nodes.clear()
+        self._by_handle.clear()
+        for index, bus in enumerate(self.buses):
+            for node in bus.nodes:
+                node.handle = (index << 8) | node.address
+                self.nodes.append(node)
+                self._by_handle[node.handle] = node
+
+    def node(self, handle) -> G6Node:
+        return self._by_handle[handle]
+
+    def reset(self, count=2):
+        self._each(lambda bus: bus.reset(count))
+        self.nodes.clear()
+        self._by_handle.clear()
+
+    def start_scheduler(self):
+        for bus in self.buses:
+            bus.start_scheduler()
+
+    def stop_scheduler(self):
+        for bus in self.buses:
+            bus.stop_scheduler()
+
+    def start_reliable(self):
+        for bus in self.buses:
+            bus.start_reliable()
+
+    def stop_reliable(self):
+        self._each(lambda bus: bus.stop_reliable())
+
+    def start_sync(self):
+        for bus in self.buses:
+            bus.start_sync()
+
+    def stop_sync(self):
+        for bus in self.buses:
+            bus.stop_sync()
+
+    def snapshot(self):
+        return {str(bus.port): bus.stats.snapshot() for bus in self.buses}
+
+    def dump_stats(self, out=print):
+        for bus in self.buses:
+            out(f"[{bus.port}]")
+            bus.stats.dump(out)
@@ -6,10 +6,102 @@ COM_PORT_VID_PID = (
 
 G6_RESET_DELAY = 0.1
 G6_PING_DELAY = 0.02
+# Upper bound on how long the chain may take to answer after a reset
 G6_POST_RESET_DELAY = 1
 G6_TIMEOUT = 0.05
+# Gap allowed between bytes of a frame once its first byte has arrived
+G6_BYTE_TIMEOUT = 0.01
+# Window for a node to claim an address during enumeration
+G6_ASSIGN_TIMEOUT = 0.15
+# Upper bound on the bridge's bootloader, and how often we probe it meanwhile
+G6_BRIDGE_READY_TIMEOUT = 3
+G6_BRIDGE_READY_POLL = 0.02
 G6_RESEND_RETRIES = 2
 
+# Enumerated node table, reused across restarts when the bus hasn't changed
+G6_TOPOLOGY_CACHE = ".g6-topology.json"
+# Compiled performance plans, one file per score and topology
+G6_PLAN_CACHE = ".g6-plans"
+
+# Bytes the bridge can buffer before it must ack; bounds a write_many burst
+G6_BRIDGE_BUFFER = 64
+# Answers queue up in the bridge until we read them, so pipelined requests
+# expecting more than this many bytes back are split up
+G6_INFO_WINDOW = G6_BRIDGE_BUFFER
+
+# Nodes with a frame in flight at once in reliable mode, and how many times
+# a frame is resent before it is given up on
+G6_RELIABLE_WINDOW = 8
+G6_RELIABLE_RETRIES = 3
+
+# Playback wake-ups sleep until this close to the deadline, then spin
+G6_CLOCK_SPIN = 0.0003
+# Wake-up lateness histogram buckets, in ns; finer than G6_STATS_BUCKETS
+G6_CLOCK_BUCKETS = tuple(int(i * 1000) for i in (
+    5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000
+))
+
+# Notes each note channel can sound at once, by instrument name, for those
+# that can't play every note in their range together. Any other instrument
+# is taken to be fully polyphonic.
+G6_POLYPHONY = {
+    "Musical Steppers": 4,
+}
+
+# How far ahead of time events are streamed to nodes in lookahead mode, and
+# how many a node is assumed to be able to hold before they are due. Only
+# for nodes that fire events at their timestamps rather than on arrival.
+G6_LOOKAHEAD_WINDOW = 0.2
+G6_NODE_EVENT_BUFFER = 32
+
+# Commands for one node this close together go out in one frame, as long as
+# it stays under this many bytes before escaping
+G6_COALESCE_QUANTUM = 0.005
+G6_COALESCE_MAX_FRAME = 48
+
+# Most bytes taken from a live MIDI source per read
+G6_LIVE_READ_SIZE = 1024
+
+# Silence left between pieces in a playlist, in ms
+G6_PLAYLIST_GAP = 0
+
+# Seek checkpoints are this many ms of score apart
+G6_SEEK_INTERVAL = 1000
+
+# Background clock sync: time between idle-bus pings, and round trips kept
+# per node for fitting
+G6_SYNC_INTERVAL = 0.25
+G6_SYNC_SAMPLES = 32
+
+# Upper edges of the latency histogram buckets, in ns
+G6_STATS_BUCKETS = tuple(int(i * 1000) for i in (
+    50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000
+))
+
+# Per-node flow control (frames/s): nodes start at the ceiling, halve on
+# OVERFLOW/BUSY and climb back by G6_FLOW_INCREASE every second
+G6_FLOW_MAX_RATE = 1000
+G6_FLOW_MIN_RATE = 20
+G6_FLOW_INCREASE = 50
+G6_FLOW_DECREASE = 0.5
+G6_FLOW_BURST = 8
+# Longest the TX thread goes without checking for refused frames while busy;
+# inline writes also check once this many frames are unchecked
+G6_FLOW_DRAIN_INTERVAL = 0.05
+G6_FLOW_DRAIN_FRAMES = 16
+# After a refusal, confirm every frame on its own for this long (s), so the
+# next refusal can be pinned on the frame that caused it
+G6_FLOW_CAREFUL = 1.0
+
+# Transmit priority classes, most urgent first
+G6_PRIORITY_NOTE = 0
+G6_PRIORITY_CONTROL = 1
+G6_PRIORITY_LIGHT = 2
+G6_PRIORITY_PING = 3
+G6_PRIORITY_NAMES = ("note", "control", "light", "ping")
+# Queued light frames per node before the oldest are dropped
+G6_LIGHT_QUEUE_LIMIT = 16
+
 G6_SYNC = 0xE0
 G6_MARK = 0xD0
 
@@ -8,3 +8,7 @@ class G6StatusNack(G6Error):
 
 class G6ReportNack(G6Error):
     pass
+
+
+class G6ChecksumError(G6Error):
+    pass
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from .const import (
+    G6_FLOW_MAX_RATE, G6_FLOW_MIN_RATE, G6_FLOW_INCREASE, G6_FLOW_DECREASE, G6_FLOW_BURST
+)
+
+
+class _Bucket:
+    __slots__ = ("rate", "tokens", "updated", "congestion")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.tokens = float(burst)
+        self.updated = now
+        self.congestion = 0
+
+
+class G6FlowControl:
+    """
+    Per-node AIMD rate limiting. Each node gets a token bucket refilled at
+    its current rate; the rate climbs back linearly while the node keeps up
+    and halves every time it answers OVERFLOW or BUSY. Nodes start at the
+    ceiling, so a bus of fast instruments is never held back.
+    """
+
+    def __init__(self, max_rate=G6_FLOW_MAX_RATE, min_rate=G6_FLOW_MIN_RATE,
+                 increase=G6_FLOW_INCREASE, decrease=G6_FLOW_DECREASE, burst=G6_FLOW_BURST):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self._buckets: dict[int, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, address, now):
+        # Caller holds the lock
+        bucket = self._buckets.get(address)
+        if bucket is None:
+            bucket = self._buckets[address] = _Bucket(self.max_rate, self.burst, now)
+            return bucket
+        elapsed = now - bucket.updated
+        if elapsed > 0:
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase * elapsed)
+            bucket.tokens = min(self.burst, bucket.tokens + bucket.rate * elapsed)
+            bucket.updated = now
+        return bucket
+
+    def take(self, address, now=None):
+        # Spend a token if the node can take another frame right now
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._bucket(address, now)
+            if bucket.tokens < 1:
+                return False
+            bucket.tokens -= 1
+            return True
+
+    def wait_time(self, address, now=None):
+        # Seconds until the node has a token again
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._bucket(address, now)
+            if bucket.tokens >= 1:
+                return 0.0
+            return (1 - bucket.tokens) / bucket.rate
+
+    def congested(self, address, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._bucket(address, now)
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.congestion += 1
+
+    def throttled(self, address, now=None):
+        # Whether the node has been slowed down and hasn't yet recovered
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if address not in self._buckets:
+                return False
+            return self._bucket(address, now).rate < self.max_rate
+
+    def backoff(self, address):
+        # How long to hold a refused frame before trying it again
+        with self._lock:
+            bucket = self._bucket(address, time.monotonic())
+            return 1 / bucket.rate
+
+    def limits(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                address: {
+                    "rate": self._bucket(address, now).rate,
+                    "tokens": bucket.tokens,
+                    "congestion": bucket.congestion,
+                }
+                for address, bucket in list(self._buckets.items())
+            }
@@ -1,28 +1,111 @@
+import math
 import threading
 import serial
 import serial.tools.list_ports
 import time
 
-from .error import G6Error
-from .const import COM_PORT_VID_PID, G6_NODE_BROADCAST, G6_CMD_RESET, G6_RESET_DELAY, G6_CMD_RESET_CHECK, G6_CMD_ASSIGN_ADDR, G6_POST_RESET_DELAY
-from .packet import G6PacketOut
+from .error import G6Error, G6ChecksumError, G6StatusNack
+from .const import (
+    COM_PORT_VID_PID, G6_BRIDGE_BUFFER, G6_NODE_BROADCAST, G6_CMD_RESET, G6_RESET_DELAY,
+    G6_CMD_RESET_CHECK, G6_CMD_ASSIGN_ADDR, G6_POST_RESET_DELAY, G6_PRIORITY_NOTE,
+    G6_PRIORITY_CONTROL, G6_BYTE_TIMEOUT, G6_ASSIGN_TIMEOUT, G6_BRIDGE_READY_TIMEOUT,
+    G6_BRIDGE_READY_POLL, G6_INFO_WINDOW, G6_RESEND_RETRIES, G6_RELIABLE_WINDOW,
+    G6_STATUS_OVERFLOW, G6_STATUS_SUM, G6_FLOW_CAREFUL, G6_TIMEOUT, G6_CMD_REQUEST_RETRANSMIT,
+    G6_FLOW_DRAIN_INTERVAL, G6_FLOW_DRAIN_FRAMES
+)
+from .packet import G6PacketOut, G6FrameDecoder
 from .util import wait_resp
-from .node import G6Node
+from .node import G6Node, INFO_COMMANDS, INFO_ANSWER_SIZES
+from .scheduler import G6TxScheduler
+from .reliable import G6ReliableLink
+from .sync import G6ClockSync
+from .stats import G6Stats
+from .flow import G6FlowControl
+from .clock import G6Clock
+from .topology import load_topology, save_topology, node_from_dict
 
 
 MIN_SEND_DELAY = 0
 # MIN_SEND_DELAY = 0.01
 
 
+def read_requests(n, timeout, first):
+    # Timed reads for n bytes, as many to a request as the bridge's buffer
+    # holds. `first` is how long the leading read waits.
+    reads = [first] + [timeout] * (n - 1)
+    step = G6_BRIDGE_BUFFER // 3
+    for start in range(0, n, step):
+        request = bytearray()
+        for i in reads[start:start + step]:
+            ms = int(i * 1000)
+            request += bytearray([1, ms >> 8, ms & 0xff])
+        yield request
+
+
+class ReadAnswers:
+    """
+    The bridge's answers to `pending` timed reads, fed a byte at a time: a
+    status byte followed, if the read succeeded, by the data byte.
+    """
+
+    __slots__ = ("pending", "data", "timed_out", "_have_status")
+
+    def __init__(self, pending, data=None):
+        self.pending = pending
+        self.data = bytearray() if data is None else data
+        self.timed_out = False
+        self._have_status = False
+
+    def feed(self, byte):
+        # True once every answer is in
+        if self._have_status:
+            self.data.append(byte)
+            self._have_status = False
+            self.pending -= 1
+        elif byte == 0x00:
+            self._have_status = True
+        else:
+            self.timed_out = True
+            self.pending -= 1
+        return not self.pending
+
+
 class G6Com:
-    def __init__(self, port, baud):
-        self.com = serial.Serial(port, baud)
-        time.sleep(2)
-        self.com.timeout = 0.1
+    def __init__(self, port, baud, ser=None):
+        # `ser` lets a pre-opened port (such as a simulated bus) stand in
+        if ser is None:
+            self.com = serial.Serial(port, baud)
+        else:
+            self.com = ser
         self.timeout = 1
+        self.decoder = G6FrameDecoder()
+        self.stats = G6Stats(baud)
+        self.ready_time = self.wait_ready()
+        print(f"[+] Bridge ready after {self.ready_time * 1000:.0f}ms")
+        self.com.timeout = 0.1
+
+    def wait_ready(self, ceiling=G6_BRIDGE_READY_TIMEOUT):
+        # Opening the port resets the bridge into its bootloader. Keep asking
+        # for a zero-timeout read until the firmware answers with a status.
+        start = time.monotonic()
+        self.com.timeout = G6_BRIDGE_READY_POLL
+        while True:
+            self.com.write(b"\1\0\0")
+            self.com.flush()
+            if self.com.read(1):
+                break
+            if time.monotonic() - start > ceiling:
+                raise G6Error("Bridge did not come up")
+        ready = time.monotonic() - start
+
+        # Probes sent while it was booting may still be answered; drop them
+        while self.com.read(64):
+            pass
+        return ready
 
     def write(self, data):
-        data = bytes(data)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
 
         self.com.write(b"\0")
         self.com.write(bytearray([len(data) >> 8, len(data) & 0xff]))
@@ -30,80 +113,571 @@ class G6Com:
         self.com.write(data)
         self.com.flush()
 
-        if self.com.read(1) != b"\xE0":
+        start = time.perf_counter_ns()
+        ack = self.com.read(1)
+        self.stats.record("write_ack", time.perf_counter_ns() - start)
+        self.stats.incr("frames_out")
+        self.stats.incr("bytes_out", len(data))
+        if ack != b"\xE0":
             raise TimeoutError
 
-    def read_one(self):
-        self.com.write(b"\1")
-        timeout = int(self.timeout * 1000)
-        self.com.write(bytearray([timeout >> 8, timeout & 0xff]))
-        status = self.com.read(1)
-        if not status:
-            print("HW timeout(1)!")
+    def write_many(self, frames, window=G6_BRIDGE_BUFFER):
+        # Pack as many frames as fit in the bridge's buffer into one transfer,
+        # then collect all of their acks with a single read.
+        burst = bytearray()
+        pending = 0
+        for data in frames:
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                data = bytes(data)
+            if pending and len(burst) + len(data) + 3 > window:
+                self._write_burst(burst, pending)
+                burst.clear()
+                pending = 0
+            burst.append(0)
+            burst += bytearray([len(data) >> 8, len(data) & 0xff])
+            burst += data
+            pending += 1
+        if pending:
+            self._write_burst(burst, pending)
+
+    def _write_burst(self, burst, count):
+        self.com.write(burst)
+        self.com.flush()
+
+        start = time.perf_counter_ns()
+        acks = self.com.read(count)
+        self.stats.record("burst_ack", time.perf_counter_ns() - start)
+        self.stats.incr("frames_out", count)
+        self.stats.incr("bytes_out", len(burst) - 3 * count)
+        if acks != b"\xE0" * count:
             raise TimeoutError
-        if status[0] != 0x00:
+
+    def read_bulk(self, n, timeout=None, first=None):
+        # Queue timed reads with the bridge, as many at a time as its buffer
+        # holds. Each answer is a status byte followed, if the read
+        # succeeded, by the data byte. `first` lets the leading read wait
+        # longer than the ones after it.
+        if n <= 0:
+            return bytearray()
+        timeout = self.timeout if timeout is None else timeout
+        first = timeout if first is None else first
+
+        # The port must outlast the bridge's own timeout or we desync from it
+        hw_timeout = max(first, timeout) + 0.1
+        if self.com.timeout is None or self.com.timeout < hw_timeout:
+            self.com.timeout = hw_timeout
+
+        data = bytearray()
+        timed_out = False
+        for request in read_requests(n, timeout, first):
+            self.com.write(request)
+            self.com.flush()
+            timed_out |= self._read_answers(len(request) // 3, data)
+            if timed_out:
+                # Later reads would only wait for bytes that aren't coming
+                break
+
+        if timed_out:
             print("SW timeout!")
             raise TimeoutError
+        return data
+
+    def _read_answers(self, pending, data):
+        # Collect the answers to `pending` queued reads into `data`, and
+        # return whether any of them timed out on the bridge
+        answers = ReadAnswers(pending, data)
+        lost = False
+        while answers.pending:
+            # Every outstanding answer is at least one more byte, so asking for
+            # `pending` never blocks on bytes that will not come
+            chunk = self.com.read(answers.pending)
+            if not chunk:
+                if lost:
+                    break
+                # Keep reading what the bridge still owes us, so the next
+                # request isn't matched with these answers
+                print("HW timeout!")
+                lost = True
+                continue
+            for byte in chunk:
+                answers.feed(byte)
 
-        read = self.com.read(1)
-        if not read:
-            print("HW timeout(2)!")
+        if lost:
             raise TimeoutError
-        return read[0]
+        return answers.timed_out
+
+    def read_one(self):
+        return self.read_bulk(1)[0]
 
     def read_n(self, n):
-        return bytearray(self.read_one() for _ in range(n))
+        return self.read_bulk(n)
+
+    def read_packet(self):
+        # Ask for exactly as many bytes as could finish the frame in progress.
+        # Only a frame's first byte waits the full timeout; the rest follow
+        # at line rate.
+        decoder = self.decoder
+        bad_frames = decoder.bad_frames
+        try:
+            while True:
+                if decoder.in_frame:
+                    chunk = self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT)
+                else:
+                    chunk = self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT, self.timeout)
+                self.stats.incr("bytes_in", len(chunk))
+                packets = decoder.feed(chunk)
+                if packets:
+                    return packets[0]
+                if decoder.bad_frames != bad_frames:
+                    raise G6ChecksumError()
+        except TimeoutError:
+            decoder.reset()
+            raise
+
+    def drain(self, wait=0):
+        # Collect answers nobody waited for, such as a node refusing a
+        # fire-and-forget frame. Only the first probe waits, for up to `wait`
+        # seconds; after that nothing more is waited for.
+        packets = []
+        decoder = self.decoder
+        ms = math.ceil(wait * 1000)
+        if self.com.timeout is None or self.com.timeout < wait + 0.1:
+            self.com.timeout = wait + 0.1
+        try:
+            while True:
+                if decoder.in_frame:
+                    chunk = self.read_bulk(decoder.wanted(), G6_BYTE_TIMEOUT)
+                else:
+                    self.com.write(bytearray([1, ms >> 8, ms & 0xff]))
+                    self.com.flush()
+                    ms = 0
+                    if self.com.read(1) != b"\0":
+                        return packets
+                    chunk = self.com.read(1)
+                self.stats.incr("bytes_in", len(chunk))
+                packets += decoder.feed(chunk)
+        except TimeoutError:
+            decoder.reset()
+            return packets
 
     def flush(self):
         pass
 
 
+def _dst(frame):
+    # Addresses are never escaped, so it's always the byte after SYNC
+    return frame.dst if isinstance(frame, G6PacketOut) else frame[1]
+
+
+def _retryable(error):
+    # Only a frame the node refused is safe to send again. A damaged answer
+    # means it ran the frame, and any other nack may come after earlier
+    # commands in the frame have already acted.
+    return isinstance(error, G6StatusNack) and error.args[0].status in (G6_STATUS_SUM, G6_STATUS_OVERFLOW)
+
+
+def locate_ports():
+    return [
+        i.name for i in serial.tools.list_ports.comports()
+        if (i.vid, i.pid) in COM_PORT_VID_PID
+    ]
+
+
 class G6Master:
-    def __init__(self, port=None, baud=115200):
-        if port is None:
-            port = self.locate_port()
-        print(f"[+] Connecting to conductor using {port}")
+    def __init__(self, port=None, baud=115200, clock=None, com=None):
+        if com is None:
+            if port is None:
+                port = self.locate_port()
+            print(f"[+] Connecting to conductor using {port}")
+            # com = serial.Serial(port, baud)
+            com = G6Com(port, baud)
+        self.port = port
         self.nodes: list[G6Node] = []
-        # self.com = serial.Serial(port, baud)
-        self.com = G6Com(port, baud)
+        self.com = com
         self.lock = threading.Lock()
         self._last_send = 0
+        self.scheduler: G6TxScheduler | None = None
+        self.reliable: G6ReliableLink | None = None
+        self.sync: G6ClockSync | None = None
+        self.stats: G6Stats = com.stats
+        self.flow = G6FlowControl()
+        # (address, frame, tries) for fire-and-forget frames not yet known
+        # to have been taken, in the order they were sent
+        self._unanswered = []
+        self._unanswered_since = 0.0
+        self._careful_until = 0.0
+        self._last_write = 0.0
+        self.clock = G6Clock() if clock is None else clock
+
+    def start_scheduler(self):
+        if self.scheduler is None:
+            self.scheduler = G6TxScheduler(self)
+            self.scheduler.start()
+        return self.scheduler
+
+    def stop_scheduler(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+
+    def start_reliable(self, window=G6_RELIABLE_WINDOW):
+        # Notes go through an acknowledged, retransmitting link from now on
+        if self.reliable is None:
+            self.reliable = G6ReliableLink(self, window)
+            self.reliable.start()
+        return self.reliable
+
+    def stop_reliable(self):
+        if self.reliable is not None:
+            self.reliable.flush()
+            self.reliable.stop()
+            self.reliable = None
+
+    def start_sync(self):
+        # Keep refining node latencies in the gaps between frames
+        if self.sync is None:
+            self.sync = G6ClockSync(self)
+            self.sync.start()
+        return self.sync
+
+    def stop_sync(self):
+        if self.sync is not None:
+            self.sync.stop()
+            self.sync = None
+
+    def submit(self, address, data: bytes, priority=G6_PRIORITY_NOTE):
+        # Queue for the TX thread if it is running, otherwise write inline
+        if self.scheduler is None:
+            self.write(data)
+        else:
+            self.scheduler.submit(address, data, priority)
+
+    def submit_exchange(self, address, data: bytes, priority=G6_PRIORITY_CONTROL):
+        if self.scheduler is None:
+            return self.exchange(data)
+        return self.scheduler.submit(address, data, priority, response=True).result()
 
     def exchange(self, data: bytes):
-        self.write(data)
+        start = time.perf_counter_ns()
         with self.lock:
-            ret = wait_resp(self.com)
-            return ret
+            self._drain()
+            self._pace()
+            self.com.write(data)
+            try:
+                resp = wait_resp(self.com)
+            except (G6ChecksumError, G6StatusNack) as e:
+                resp = self._recover(data, e)
+        # Addresses, lengths and opcodes never need escaping, so data[3] is
+        # always the first command
+        self.com.stats.record("exchange", time.perf_counter_ns() - start, f"{data[3]:02x}")
+        return resp
+
+    def _recover(self, data, error):
+        # Get a good answer to data after `error`. Caller holds the lock, and
+        # nothing may have been sent to the node since data.
+        for _ in range(G6_RESEND_RETRIES):
+            frame, delay = self._recovery(data, error)
+            if delay:
+                time.sleep(delay)
+            self.com.write(frame)
+            try:
+                return wait_resp(self.com)
+            except (G6ChecksumError, G6StatusNack) as e:
+                error = e
+        raise error
+
+    def _recovery(self, data, error):
+        # What to send, and after how long, for another go at an answer to
+        # data. A damaged answer is asked for again with
+        # G6_CMD_REQUEST_RETRANSMIT, as the node has already run the frame;
+        # only a frame it refused is sent again. Anything else is raised.
+        if isinstance(error, G6ChecksumError):
+            self.com.stats.incr("retransmit")
+            return bytes(G6PacketOut(_dst(data), (G6_CMD_REQUEST_RETRANSMIT, b""))), 0.0
+        if not _retryable(error):
+            raise error
+        delay = 0.0
+        if error.args[0].status == G6_STATUS_OVERFLOW:
+            # The node is full; give it a moment and send slower from now on
+            self.com.stats.incr("overflow")
+            self.flow.congested(_dst(data))
+            delay = self.flow.backoff(_dst(data))
+        self.com.stats.incr("redo")
+        return data, delay
+
+    def exchange_many(self, frames, sizes=None, window=G6_INFO_WINDOW):
+        # Pipeline the requests and collect the responses in order, which is
+        # the only way to tell them apart as they carry no source address.
+        # Given the bytes each answer is expected to take, only so many are
+        # in flight as the bridge can hold the answers to.
+        frames = [bytes(i) for i in frames]
+        if sizes is None:
+            return self._exchange_many(frames)
+        responses = []
+        batch = []
+        size = 0
+        for frame, n in zip(frames, sizes):
+            if batch and size + n > window:
+                responses += self._exchange_many(batch)
+                batch = []
+                size = 0
+            batch.append(frame)
+            size += n
+        if batch:
+            responses += self._exchange_many(batch)
+        return responses
+
+    def _exchange_many(self, frames):
+        with self.lock:
+            self._drain()
+            self._pace()
+            self.com.write_many(frames)
+            responses = []
+            failed = []
+            for idx in range(len(frames)):
+                # A bad answer still occupies its slot; keep reading so the
+                # rest of the pipeline doesn't get matched to later requests
+                try:
+                    responses.append(wait_resp(self.com))
+                except (G6ChecksumError, G6StatusNack) as e:
+                    responses.append(e)
+                    failed.append(idx)
+
+            # Then recover the failed ones one at a time. A node only repeats
+            # its last answer, so damaged ones go first, and only the answer
+            # to a node's last frame in the pipeline can be recovered at all.
+            last = {_dst(frame): idx for idx, frame in enumerate(frames)}
+            failed.sort(key=lambda idx: not isinstance(responses[idx], G6ChecksumError))
+            for idx in failed:
+                if isinstance(responses[idx], G6ChecksumError) and last[_dst(frames[idx])] != idx:
+                    raise responses[idx]
+                responses[idx] = self._recover(frames[idx], responses[idx])
+            return responses
+
+    def query_info(self, nodes, window=G6_INFO_WINDOW):
+        # Batched request_info over several nodes at once, as many nodes to a
+        # batch as the bridge can hold the answers of. Returns the nodes whose
+        # answers did not all come back cleanly.
+        failed = []
+        per_node = len(INFO_COMMANDS)
+        per_node_size = sum(INFO_ANSWER_SIZES)
+        step = max(1, window // per_node_size)
+        for start in range(0, len(nodes), step):
+            group = nodes[start:start + step]
+            try:
+                responses = self.exchange_many(
+                    (frame for node in group for frame in node.info_frames()),
+                    INFO_ANSWER_SIZES * len(group), window
+                )
+            except (TimeoutError, G6Error):
+                failed.extend(group)
+                continue
+
+            for idx, node in enumerate(group):
+                try:
+                    node.apply_info(responses[idx * per_node:(idx + 1) * per_node])
+                except G6Error:
+                    failed.append(node)
+        return failed
+
+    def _pace(self):
+        now = time.time()
+        delta = now - self._last_send
+        if delta < MIN_SEND_DELAY:
+            time.sleep(delta)
+        self._last_send = now
+
+    def drain(self, wait=True):
+        # With wait=False nothing is drained, and False returned, while the
+        # last frame's answer could still be on its way
+        with self.lock:
+            if not wait and self.reply_wait() > 0:
+                return False
+            self._drain()
+            return True
+
+    def reply_wait(self):
+        # How long until any answer to the last frame sent must have arrived
+        if not self._unanswered:
+            return 0.0
+        return max(0.0, self._last_write + self.reply_window() - time.monotonic())
+
+    def reply_window(self):
+        # How long after the last frame sent any answer to it can take
+        if not self._unanswered:
+            return 0.0
+        address = self._unanswered[-1][0]
+        node = next((i for i in self.nodes if i.address == address), None)
+        return G6_TIMEOUT if node is None else min(G6_TIMEOUT, 2 * node.latency)
+
+    def _drain(self):
+        # A node that can't take a frame answers OVERFLOW even if nobody asked,
+        # and says nothing if it can. Clear such strays before waiting on a
+        # real answer, then send the refused frames again and slow down
+        # whoever refused them. Frames resent may be refused again, and
+        # callers read the next answer as theirs, so nothing is left
+        # outstanding; every resend adds a try, so this ends. Caller holds
+        # the lock.
+        while self._unanswered:
+            for address, frame, tries in self._refused(self.com.drain(self.reply_wait())):
+                time.sleep(self.flow.backoff(address))
+                self.com.stats.incr("redo")
+                self._write(frame, tries)
+
+    def _refused(self, packets, count=None):
+        # Settle the first `count` unanswered frames (all of them by default)
+        # against the strays drained after them, and return the (address,
+        # frame, tries) to send again
+        count = len(self._unanswered) if count is None else count
+        pending = self._unanswered[:count]
+        del self._unanswered[:count]
+        refused = 0
+        for pkt in packets:
+            self.com.stats.incr("unsolicited")
+            if pkt.status == G6_STATUS_OVERFLOW:
+                refused += 1
+        if not refused:
+            return []
+
+        self.com.stats.incr("overflow", refused)
+        # Confirm frames one at a time for a while, so that any more
+        # refusals can be pinned on the frame that was refused
+        self._careful_until = time.monotonic() + G6_FLOW_CAREFUL
+        addresses = {address for address, _, _ in pending}
+        if len(addresses) == 1:
+            self.flow.congested(pending[0][0])
+        if refused != len(pending):
+            # Answers carry no address, so there's no telling which frames
+            # these were, and resending the wrong one would play it twice
+            self.com.stats.incr("overflow_unattributed", refused)
+            print(f"W: {refused} of {len(pending)} frame(s) to nodes {sorted(addresses)} refused")
+            return []
+
+        resend = []
+        for address, frame, tries in pending:
+            if len(addresses) > 1:
+                self.flow.congested(address)
+            if tries >= G6_RESEND_RETRIES:
+                print(f"W: Gave up on a frame to node {address}")
+                self.com.stats.incr("overflow_lost")
+                continue
+            resend.append((address, frame, tries + 1))
+        return resend
+
+    def _write(self, frame, tries=0):
+        # Caller holds the lock
+        self.com.write(frame)
+        self._last_write = time.monotonic()
+        if not self._unanswered:
+            self._unanswered_since = self._last_write
+        self._unanswered.append((_dst(frame), bytes(frame), tries))
+
+    def _drain_due(self, coming=0):
+        # Without the TX thread nobody else looks for refusals, and the more
+        # frames they could be for, the less likely they can be resent
+        return len(self._unanswered) + coming >= G6_FLOW_DRAIN_FRAMES or (
+            self._unanswered and time.monotonic() - self._unanswered_since > G6_FLOW_DRAIN_INTERVAL
+        )
+
+    def _confirming(self, address):
+        # Frames to a node that has been refusing them are confirmed one at a
+        # time, so a refusal is always the frame just sent. After a refusal
+        # nobody could be blamed for, every frame is for a while.
+        return time.monotonic() < self._careful_until or self.flow.throttled(address)
 
     def write(self, data: bytes):
         with self.lock:
-            now = time.time()
-            delta = now - self._last_send
-            if delta < MIN_SEND_DELAY:
-                time.sleep(delta)
-            self._last_send = now
+            self._pace()
+            if self._unanswered and (
+                self._confirming(_dst(data)) or self._confirming(self._unanswered[-1][0])
+                or self._drain_due()
+            ):
+                self._drain()
+            self._write(data)
 
-            self.com.write(data)
+    def write_many(self, frames):
+        frames = list(frames)
+        with self.lock:
+            self._pace()
+            if self._drain_due():
+                self._drain()
+            burst = []
+            for frame in frames:
+                if not self._confirming(_dst(frame)):
+                    burst.append(frame)
+                    if self._drain_due(len(burst)):
+                        self._write_burst(burst)
+                        burst = []
+                        self._drain()
+                    continue
+                self._write_burst(burst)
+                burst = []
+                self._drain()
+                self._write(frame)
+                self._drain()
+            self._write_burst(burst)
 
-    def locate_port(self):
-        devices = serial.tools.list_ports.comports()
+    def _write_burst(self, frames):
+        # Caller holds the lock
+        if not frames:
+            return
+        self.com.write_many(frames)
+        self._last_write = time.monotonic()
+        if not self._unanswered:
+            self._unanswered_since = self._last_write
+        self._unanswered.extend((_dst(i), bytes(i), 0) for i in frames)
 
-        for i in devices:
-            if (i.vid, i.pid) in COM_PORT_VID_PID:
-                return i.name
-        raise G6Error("No serial ports found")
+    def locate_port(self):
+        ports = locate_ports()
+        if not ports:
+            raise G6Error("No serial ports found")
+        return ports[0]
 
     def reset(self, count=2):
         self.nodes.clear()
         for _ in range(count):
             self.com.write(G6PacketOut(G6_NODE_BROADCAST, (G6_CMD_RESET, bytearray([G6_CMD_RESET_CHECK]))))
             time.sleep(G6_RESET_DELAY)
-        time.sleep(G6_POST_RESET_DELAY)
 
-    def enumerate_bus(self, retries=5):
+    def restore_bus(self, cache):
+        entries = load_topology(cache, self.port)
+        if not entries:
+            return False
+
+        print("Verifying cached bus topology...")
+        nodes = [node_from_dict(self, i) for i in entries]
+        for i in nodes:
+            try:
+                i.ping()
+            except (TimeoutError, G6Error):
+                print(f"Node {i.address} did not answer")
+                return False
+
+        # A node added since last time will still be waiting for an address
+        self.com.write(G6PacketOut(G6_NODE_BROADCAST, (G6_CMD_ASSIGN_ADDR, bytearray([len(nodes) + 1]))))
+        try:
+            wait_resp(self.com, G6_ASSIGN_TIMEOUT)
+        except TimeoutError:
+            pass
+        except G6Error:
+            return False
+        else:
+            print("New node on the bus")
+            return False
+
+        self.nodes = nodes
+        print(f"Restored {len(nodes)} device{'s' if len(nodes) != 1 else ''} from {cache}")
+        return True
+
+    def enumerate_bus(self, retries=5, cache=None):
+        if cache is not None and self.restore_bus(cache):
+            return
+
         self.reset(5)
 
         print("Enumerating bus...")
+        start = time.monotonic()
+        self.bus_ready_time = None
         next_id = 1
         while True:
             retry = False
@@ -111,15 +685,21 @@ class G6Master:
             print(".", end="", flush=True)
             # Set ID
             self.com.write(G6PacketOut(G6_NODE_BROADCAST, (G6_CMD_ASSIGN_ADDR, bytearray([next_id]))))
-            time.sleep(0.1)
             try:
-                wait_resp(self.com)
+                wait_resp(self.com, G6_ASSIGN_TIMEOUT)
             except TimeoutError:
+                # Straight after a reset the chain may still be booting, so
+                # keep offering the first address until someone takes it
+                if next_id == 1 and time.monotonic() - start < G6_POST_RESET_DELAY:
+                    continue
                 print("\nEnumeration done!")
                 break
             except G6Error:
                 retry = True
             else:
+                if next_id == 1:
+                    self.bus_ready_time = time.monotonic() - start
+                    print(f"\nBus ready after {self.bus_ready_time * 1000:.0f}ms")
                 self.nodes.append(G6Node(self, next_id))
                 next_id += 1
 
@@ -129,14 +709,18 @@ class G6Master:
                     break
                 self.reset(2)
                 self.com.flush()
+                start = time.monotonic()
                 next_id = 1
                 retries -= 1
 
         print(f"\nFound {next_id - 1} device{'s' if next_id != 2 else ''}")
+        unqueried = self.query_info(self.nodes)
         for i in self.nodes:
             for _ in range(5):
                 try:
-                    i.request_info()
+                    if i in unqueried:
+                        i.request_info()
+                        unqueried.remove(i)
                     i.measure_latency()
                 except TimeoutError:
                     print("TO")
@@ -151,3 +735,6 @@ class G6Master:
                 quit()
 
             print(i)
+
+        if cache is not None:
+            save_topology(cache, self.port, self.nodes)
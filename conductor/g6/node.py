@@ -1,17 +1,40 @@
 import struct
+import threading
 import time
 
+from .capabilities import G6NodeCapabilities
 from .error import G6ReportNack
-from .packet import G6PacketOut
+from .packet import G6PacketOut, G6EventEncoder
 from .const import (
     G6_CMD_GRAPHENE_DOWN, G6_CMD_READ_ID, G6_CMD_GET_CMD_VERSION, G6_CMD_GET_COMM_VERSION,
     G6_CMD_GET_FEATURES, G6_CMD_GET_G6_VERSION, G6_CMD_GRAPHENE_CNTR, G6_CMD_GRAPHENE_INCR,
-    G6_CMD_GRAPHENE_PING, G6_FEATURE_NOTE_CHANNEL, G6_FEATURE_EOF, G6_CMD_GRAPHENE_UP,
+    G6_CMD_GRAPHENE_PING, G6_FEATURE_EOF, G6_CMD_GRAPHENE_UP,
     G6_PING_DELAY, G6_CMD_GRAPHENE_LIGHT, G6_CMD_GRAPHENE_CONTROL, G6_REPORT_OK,
-    G6_FEATURE_LIGHT_CHANNEL, G6_FEATURE_CONTROL_CHANNEL, G6_FEATURE_OFFSET
+    G6_PRIORITY_NOTE, G6_PRIORITY_CONTROL, G6_PRIORITY_LIGHT, G6_PRIORITY_PING,
+    G6_REPORT_BUSY, G6_RESEND_RETRIES
 )
 
 
+# Encoders reuse one buffer, so every thread that sends gets its own
+_local = threading.local()
+
+
+def _encoder() -> G6EventEncoder:
+    encoder = getattr(_local, "encoder", None)
+    if encoder is None:
+        encoder = _local.encoder = G6EventEncoder()
+    return encoder
+
+
+INFO_COMMANDS = (
+    G6_CMD_READ_ID, G6_CMD_GET_CMD_VERSION, G6_CMD_GET_G6_VERSION, G6_CMD_GET_COMM_VERSION,
+    G6_CMD_GET_FEATURES
+)
+# Bytes each answer is expected to take: framing, status and report, plus a
+# typical identification string and feature list
+INFO_ANSWER_SIZES = (6 + 24, 7, 7, 7, 6 + 17)
+
+
 class G6Node:
     def __init__(self, master, address):
         from .master import G6Master
@@ -19,7 +42,9 @@ class G6Node:
         self.master: G6Master = master
 
         self.address = address
-        self.features = bytearray([G6_FEATURE_EOF])
+        # Unique across every bus a G6Cluster drives; the address on one bus
+        self.handle = address
+        self.features = bytes([G6_FEATURE_EOF])
         self.ioident = ""
         self.cmd_version = 0x00
         self.g6_version = 0x00
@@ -32,80 +57,37 @@ class G6Node:
             return split[n]
         return n
 
-    def get_features(self):
-        print(self.features)
-        features = bytearray(self.features)
-        json_features = []
+    @property
+    def features(self):
+        return self._features
 
-        while features:
-            op = features.pop(0)
-            if op == G6_FEATURE_EOF:
-                break
-            elif op == G6_FEATURE_NOTE_CHANNEL:
-                json_features.append({
-                    "type": "note",
-                    "channel": features.pop(0),
-                    "min": features.pop(0),
-                    "max": features.pop(0),
-                })
-            elif op == G6_FEATURE_LIGHT_CHANNEL:
-                json_features.append({
-                    "type": "light",
-                    "channel": features.pop(0),
-                    "min": features.pop(0),
-                    "max": features.pop(0),
-                })
-            elif op == G6_FEATURE_CONTROL_CHANNEL:
-                json_features.append({
-                    "type": "control",
-                    "channel": features.pop(0),
-                    "min": features.pop(0),
-                    "max": features.pop(0),
-                })
-            elif op == G6_FEATURE_OFFSET:
-                offset = struct.unpack(">h", features[:2])[0]
-                features.pop(0)
-                features.pop(0)
-                features.pop(0)
-                json_features.append({
-                    "type": "offset",
-                    "offset": offset,
-                })
-            else:
-                json_features.append({
-                    "type": "?",
-                    "0": features.pop(0),
-                    "1": features.pop(0),
-                    "2": features.pop(0),
-                })
+    @features.setter
+    def features(self, value):
+        # Decoded here, once, rather than on every lookup
+        self._features = bytes(value)
+        self.caps = G6NodeCapabilities.decode(self._features)
 
-        return json_features
+    def get_features(self):
+        return self.caps.as_list()
 
     @property
     def feature_offset(self):
-        for i in self.get_features():
-            if i["type"] == "offset":
-                return i["offset"]
-        return 0
+        return self.caps.offset
 
     def _channels(self, type_):
-        channels = {}
-        for i in self.get_features():
-            if i["type"] == type_:
-                channels[i["channel"]] = (i["min"], i["max"])
-        return channels
+        return self.caps.channels(type_)
 
     @property
     def channels(self):
-        return self._channels("note")
+        return self.caps.note_channels
 
     @property
     def light_channels(self):
-        return self._channels("light")
+        return self.caps.light_channels
 
     @property
     def contorl_channels(self):
-        return self._channels("control")
+        return self.caps.control_channels
 
     @property
     def name(self):
@@ -115,12 +97,27 @@ class G6Node:
     def version(self):
         return self._get_ioident(1)
 
+    def info_frames(self):
+        return [self.packet((cmd, b"")) for cmd in INFO_COMMANDS]
+
+    def apply_info(self, responses):
+        # One response per INFO_COMMANDS entry, in order
+        reports = []
+        for response in responses:
+            if response.data[0] != G6_REPORT_OK:
+                raise G6ReportNack()
+            reports.append(response.data[1:])
+
+        ioident, cmd_version, g6_version, comm_version, features = reports
+        self.ioident = ioident.decode("latin-1")
+        self.cmd_version = cmd_version[0]
+        self.g6_version = g6_version[0]
+        self.comm_version = comm_version[0]
+        self.features = features
+
     def request_info(self):
-        self.ioident = self.exchange_one((G6_CMD_READ_ID, b"")).decode("latin-1")
-        self.cmd_version = self.exchange_one((G6_CMD_GET_CMD_VERSION, b""))[0]
-        self.g6_version = self.exchange_one((G6_CMD_GET_G6_VERSION, b""))[0]
-        self.comm_version = self.exchange_one((G6_CMD_GET_COMM_VERSION, b""))[0]
-        self.features = self.exchange_one((G6_CMD_GET_FEATURES, b""))
+        # All five queries go out in one transfer; answers come back in order
+        self.apply_info(self.master.exchange_many(self.info_frames(), INFO_ANSWER_SIZES))
 
     def resend(self):
         if self._last is not None:
@@ -129,20 +126,32 @@ class G6Node:
             else:
                 self.master.write(self._last[0])
 
-    def send(self, *cmds: tuple[int, bytes]):
+    def packet(self, *cmds: tuple[int, bytes]):
+        return G6PacketOut(self.address, *cmds)
+
+    def send(self, *cmds: tuple[int, bytes], priority=G6_PRIORITY_NOTE):
+        if priority == G6_PRIORITY_NOTE and self.master.reliable is not None:
+            return self.master.reliable.send(self, *cmds)
         pkt = G6PacketOut(self.address, *cmds)
         self._last = (bytes(pkt), False)
-        return self.master.write(self._last[0])
+        return self.master.submit(self.address, self._last[0], priority)
 
-    def exchange(self, *cmds: tuple[int, bytes]):
+    def exchange(self, *cmds: tuple[int, bytes], priority=G6_PRIORITY_CONTROL):
         pkt = G6PacketOut(self.address, *cmds)
         self._last = (bytes(pkt), True)
-        return self.master.exchange(self._last[0])
+        return self.master.submit_exchange(self.address, self._last[0], priority)
 
-    def exchange_one(self, cmd: tuple[int, bytes]):
+    def exchange_one(self, cmd: tuple[int, bytes], priority=G6_PRIORITY_CONTROL):
         pkt = G6PacketOut(self.address, cmd)
         self._last = (bytes(pkt), True)
-        response = self.master.exchange(self._last[0])
+        for _ in range(G6_RESEND_RETRIES + 1):
+            response = self.master.submit_exchange(self.address, self._last[0], priority)
+            if response.data[0] != G6_REPORT_BUSY:
+                break
+            # Hold the command back rather than fail it, and send slower
+            flow = self.master.flow
+            flow.congested(self.address)
+            time.sleep(flow.backoff(self.address))
         if response.data[0] != G6_REPORT_OK:
             raise G6ReportNack()
         return response.data[1:]
@@ -154,7 +163,7 @@ class G6Node:
         return self.send((G6_CMD_GRAPHENE_CNTR, b""))
 
     def ping(self):
-        return self.exchange((G6_CMD_GRAPHENE_PING, b""))
+        return self.exchange((G6_CMD_GRAPHENE_PING, b""), priority=G6_PRIORITY_PING)
 
     @staticmethod
     def cmd_note_down(time, channel, note, vel):
@@ -180,14 +189,22 @@ class G6Node:
             "<IBBB", time, channel, control, value
         ))
 
+    def send_event(self, cmd, time, channel, a, b, priority=G6_PRIORITY_NOTE):
+        # Fast path for the fixed-shape commands: encoded in place, and only
+        # copied if the TX scheduler has to hold on to it
+        if priority == G6_PRIORITY_NOTE and self.master.reliable is not None:
+            return self.master.reliable.send(self, (cmd, struct.pack("<IBBB", time, channel, a, b)))
+        frame = _encoder().encode(self.address, cmd, time, channel, a, b)
+        return self.master.submit(self.address, frame, priority)
+
     def note_down(self, time, channel, note, vel):
-        self.send(self.cmd_note_down(time, channel, note, vel))
+        self.send_event(G6_CMD_GRAPHENE_DOWN, time, channel, note, vel)
 
     def note_up(self, time, channel, note, vel):
-        self.send(self.cmd_note_up(time, channel, note, vel))
+        self.send_event(G6_CMD_GRAPHENE_UP, time, channel, note, vel)
 
     def light(self, time, channel, light, value):
-        self.send(self.cmd_light(time, channel, light, value))
+        self.send_event(G6_CMD_GRAPHENE_LIGHT, time, channel, light, value, priority=G6_PRIORITY_LIGHT)
 
     def control(self, time, channel, control, value):
         self.exchange_one(self.cmd_control(time, channel, control, value))
@@ -203,48 +220,26 @@ class G6Node:
         self.latency = avg / 2
 
     def _features_str(self):
+        caps = self.caps
         ret = ""
-        features = bytearray(self.features)
-        while features:
-            op = features.pop(0)
-            if op == G6_FEATURE_EOF:
-                break
-            elif op == G6_FEATURE_NOTE_CHANNEL:
-                ret += f"   - Note    | Channel {features.pop(0)}, min:{features.pop(0)}/max:{features.pop(0)}\n"
-            elif op == G6_FEATURE_LIGHT_CHANNEL:
-                ret += f"   - Light   | Channel {features.pop(0)}, min:{features.pop(0)}/max:{features.pop(0)}\n"
-            elif op == G6_FEATURE_CONTROL_CHANNEL:
-                ret += f"   - Control | Channel {features.pop(0)}, min:{features.pop(0)}/max:{features.pop(0)}\n"
-            elif op == G6_FEATURE_OFFSET:
-                offset = struct.unpack(">h", features[:2])[0]
-                features.pop(0)
-                features.pop(0)
-                features.pop(0)
-                if offset > 0:
-                    ret += f"   - Requested offset: {offset}ms ahead\n"
-                elif offset == 0:
-                    ret += "   - Requested offset: none\n"
-                else:
-                    ret += f"   - Requested offset: {-offset}ms behind\n"
-            else:
-                ret += f"   - Unk feature {op:02x} ({features.pop(0):02x} {features.pop(0):02x} {features.pop(0):02x})\n"
+        for label, table in (
+            ("Note   ", caps.note_channels), ("Light  ", caps.light_channels), ("Control", caps.control_channels)
+        ):
+            for channel, (low, high) in table.items():
+                ret += f"   - {label} | Channel {channel}, min:{low}/max:{high}\n"
+        if caps.offset > 0:
+            ret += f"   - Requested offset: {caps.offset}ms ahead\n"
+        elif caps.offset < 0:
+            ret += f"   - Requested offset: {-caps.offset}ms behind\n"
+        elif caps.has_offset:
+            ret += "   - Requested offset: none\n"
+        for op, data in caps.unknown:
+            ret += f"   - Unk feature {op:02x} ({data[0]:02x} {data[1]:02x} {data[2]:02x})\n"
         return ret
 
     @property
     def offset(self):
-        requested = 0
-        features = bytearray(self.features)
-        while features:
-            op = features.pop(0)
-            if op == G6_FEATURE_EOF:
-                break
-            elif op == G6_FEATURE_OFFSET:
-                requested = struct.unpack(">h", features[:2])[0] / 1000
-            features.pop(0)
-            features.pop(0)
-            features.pop(0)
-
-        return requested + self.latency
+        return self.caps.offset / 1000 + self.latency
 
     def __str__(self):
         return (
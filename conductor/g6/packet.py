@@ -1,6 +1,34 @@
+import struct
+
 from .const import G6_MARK, G6_NODE_MASTER, G6_SYNC
 
 
+_SYNC = bytes([G6_SYNC])
+_MARK = bytes([G6_MARK])
+_SYNC_ESCAPED = bytes([G6_MARK, G6_SYNC - 1])
+_MARK_ESCAPED = bytes([G6_MARK, G6_MARK - 1])
+
+
+def escape(body):
+    # MARK first, so the MARKs introduced for SYNC aren't escaped again
+    return body.replace(_MARK, _MARK_ESCAPED).replace(_SYNC, _SYNC_ESCAPED)
+
+
+def unescape(raw):
+    # The body of an escaped frame, SYNC left off
+    body = bytearray()
+    escaped = False
+    for byte in raw:
+        if escaped:
+            body.append((byte + 1) & 0xff)
+            escaped = False
+        elif byte == G6_MARK:
+            escaped = True
+        else:
+            body.append(byte)
+    return body
+
+
 class G6PacketOut:
     def __init__(self, dst: int, *cmds: tuple[int, bytes]):
         self.dst = dst
@@ -15,15 +43,38 @@ class G6PacketOut:
             body.append(cmd)
             body += data
         body[1] = len(body)
-        body += bytearray([sum(body) % 256])
-        escaped = bytearray()
-        for i in body:
-            if i == G6_SYNC or i == G6_MARK:
-                escaped.append(G6_MARK)
-                escaped.append(i - 1)
-            else:
-                escaped.append(i)
-        return b"\xE0" + escaped
+        body.append(sum(body) % 256)
+        return _SYNC + escape(body)
+
+
+# dst, len, cmd, then the <IBBB payload shared by note/light/control commands
+_EVENT = struct.Struct("<BBBIBBB")
+
+
+class G6EventEncoder:
+    """
+    Builds single-command note/light/control frames straight into a reused
+    buffer. The returned memoryview is only valid until the next encode(), and
+    an encoder must not be shared between threads.
+    """
+
+    def __init__(self):
+        self._frame = bytearray(1 + _EVENT.size + 1)
+        self._frame[0] = G6_SYNC
+        self._view = memoryview(self._frame)
+
+    def encode(self, dst, cmd, time, channel, a, b):
+        _EVENT.pack_into(self._frame, 1, dst, _EVENT.size, cmd, time, channel, a, b)
+        check = (
+            dst + _EVENT.size + cmd + channel + a + b
+            + (time & 0xff) + ((time >> 8) & 0xff) + ((time >> 16) & 0xff) + (time >> 24)
+        ) & 0xff
+        self._frame[-1] = check
+
+        # Escaping is rare for events, so only pay for it when needed
+        if self._frame.find(G6_SYNC, 1) != -1 or G6_MARK in self._frame:
+            return memoryview(_SYNC + escape(self._frame[1:]))
+        return self._view
 
 
 class G6PacketIn:
@@ -32,55 +83,115 @@ class G6PacketIn:
         self.data = data
 
     @classmethod
-    def from_packet(cls, packet: bytes):
-        if len(packet) < 5:
-            return None
+    def from_serial(cls, ser):
+        return ser.read_packet()
 
-        if packet[0] != G6_SYNC:
-            return None
-        if packet[1] != G6_NODE_MASTER:
-            return None
-        dlen = packet[2]
-        status = packet[3]
-        data = packet[3:3 + dlen - 2]
-        check = packet[3 + dlen - 2]
-        if (dlen + status + sum(data)) % 256 != check:
-            print("Checksum failed!")
-            return None
 
-        return cls(status, data)
+class G6FrameDecoder:
+    """
+    Resumable decoder for the node -> master byte stream. feed() accepts
+    chunks split anywhere and returns the complete packets they finish,
+    unescaped and checksum-verified. Anything else is counted and dropped:
+    `resyncs` for bytes skipped or frames cut short by a new SYNC,
+    `bad_frames` for checksum failures and `foreign` for frames addressed to
+    another node.
+    """
 
-    @classmethod
-    def _ser_read_one(cls, ser):
-        byte = ser.read(1)
-        if len(byte) == 0:
-            raise TimeoutError
-        return byte[0]
+    def __init__(self):
+        self._raw = bytearray()
+        self._body = None
+        self._escaped = False
+        self.frames = 0
+        self.resyncs = 0
+        self.bad_frames = 0
+        self.foreign = 0
 
-    @classmethod
-    def from_serial(cls, ser):
-        while True:
-            while ser.read_one() != G6_SYNC:
+    def reset(self):
+        self._raw.clear()
+        self._body = None
+        self._escaped = False
+
+    @property
+    def in_frame(self):
+        return self._body is not None
+
+    def wanted(self):
+        # Fewest bytes that could finish the current frame; escapes only ever
+        # make a frame longer, so reading this many never over-reads
+        if self._body is None:
+            return 5
+        return self._remaining() + self._escaped
+
+    def _remaining(self):
+        # dest, dlen, status, dlen - 2 data bytes, checksum
+        body = self._body
+        if len(body) < 2:
+            return 4 - len(body)
+        return body[1] + 2 - len(body)
+
+    def feed(self, chunk) -> list[G6PacketIn]:
+        packets = []
+        raw = self._raw
+        raw += chunk
+        pos = 0
+        end = len(raw)
+
+        while pos < end:
+            if self._body is None:
+                idx = raw.find(G6_SYNC, pos)
+                if idx == -1:
+                    self.resyncs += 1
+                    pos = end
+                    break
+                if idx != pos:
+                    self.resyncs += 1
+                self._body = bytearray()
+                pos = idx + 1
                 continue
-            dest = ser.read_one()
-            dlen = ser.read_one()
-            status = ser.read_one()
-
-            data = bytearray()
-            for _ in range(dlen - 2):
-                data.append(ser.read_one())
-
-            calc_sum = (dest + dlen + status + sum(data)) % 256
-            try:
-                check = ser.read_one()
-            except TimeoutError:
-                raise
-            if calc_sum != check:
-                print("W: Checksum failed!")
-                print(f"[{dest:02x} {dlen:02x} {status:02x} {data}]  {calc_sum}(exp)!={check:02x}(seen)")
-                pass  # continue
-            if dest != G6_NODE_MASTER:
-                print("W: Packet not for master")
+
+            byte = raw[pos]
+            if byte == G6_SYNC:
+                # A raw SYNC is never part of a frame, so this one was cut short
+                self.resyncs += 1
+                self._body = None
+                self._escaped = False
                 continue
+            if self._escaped:
+                self._body.append((byte + 1) & 0xff)
+                self._escaped = False
+                pos += 1
+            elif byte == G6_MARK:
+                self._escaped = True
+                pos += 1
+            else:
+                # Copy the whole run up to the next special byte or frame end
+                run_end = pos + self._remaining()
+                for special in (G6_SYNC, G6_MARK):
+                    idx = raw.find(special, pos, run_end)
+                    if idx != -1:
+                        run_end = idx
+                self._body += raw[pos:run_end]
+                pos = run_end
 
-            return cls(status, data)
+            body = self._body
+            if len(body) >= 2 and body[1] < 2:
+                self.resyncs += 1
+                self._body = None
+            elif len(body) >= 2 and len(body) == body[1] + 2:
+                self._body = None
+                packet = self._finish(body)
+                if packet is not None:
+                    packets.append(packet)
+
+        del raw[:pos]
+        return packets
+
+    def _finish(self, body):
+        if sum(body[:-1]) % 256 != body[-1]:
+            self.bad_frames += 1
+            return None
+        if body[0] != G6_NODE_MASTER:
+            self.foreign += 1
+            return None
+        self.frames += 1
+        return G6PacketIn(body[2], bytes(body[3:-1]))
@@ -0,0 +1,244 @@
+import collections
+import threading
+import time
+
+from .const import (
+    G6_CMD_GRAPHENE_PING, G6_CMD_REQUEST_RETRANSMIT, G6_STATUS_OK, G6_STATUS_OVERFLOW,
+    G6_BRIDGE_BUFFER, G6_RELIABLE_WINDOW, G6_RELIABLE_RETRIES
+)
+from .error import G6Error, G6ChecksumError
+from .packet import G6PacketOut, G6PacketIn
+from .util import wait_resp
+
+
+# Outcomes of one frame's slot in a burst
+_ACKED = 0
+_RESEND = 1
+_UNSURE = 2
+_HELD = 3
+
+
+class _Pending:
+    __slots__ = ("seq", "frame", "tries")
+
+    def __init__(self, seq, frame):
+        self.seq = seq
+        self.frame = frame
+        self.tries = 0
+
+
+class _Link:
+    def __init__(self):
+        self.next_seq = 0
+        self.acked = -1
+        self.queue: collections.deque[_Pending] = collections.deque()
+
+
+class G6ReliableLink:
+    """
+    Acknowledged delivery for frames that would otherwise go out
+    fire-and-forget. Every frame gets a trailing PING so the node has to
+    answer it, and a host-side sequence number per node.
+
+    Answers carry neither an address nor a sequence number, so a burst holds
+    at most one frame per node: up to `window` nodes have a frame in flight,
+    each node's frames are delivered in order, and when an answer is damaged
+    G6_CMD_REQUEST_RETRANSMIT recovers it unambiguously. Frames are only sent
+    again when the node reports them damaged or nothing came back at all, so
+    a corrupted acknowledgement doesn't play a note twice.
+    """
+
+    def __init__(self, master, window=G6_RELIABLE_WINDOW, retries=G6_RELIABLE_RETRIES):
+        from .master import G6Master
+
+        self.master: G6Master = master
+        self.window = window
+        self.retries = retries
+
+        self._links: dict[int, _Link] = {}
+        self._ready: collections.deque[int] = collections.deque()
+
+        self.sent = 0
+        self.acked = 0
+        self.retransmits = 0
+        self.recovered = 0
+        self.lost = 0
+        self.held = 0
+
+        self._cv = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="g6-reliable", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cv:
+            self._running = False
+            self._cv.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def send(self, node, *cmds: tuple[int, bytes]):
+        frame = bytes(G6PacketOut(node.address, *cmds, (G6_CMD_GRAPHENE_PING, b"")))
+        with self._cv:
+            link = self._links.get(node.address)
+            if link is None:
+                link = self._links[node.address] = _Link()
+            seq = link.next_seq
+            link.next_seq += 1
+            if not link.queue:
+                self._ready.append(node.address)
+            link.queue.append(_Pending(seq, frame))
+            self._cv.notify_all()
+        return seq
+
+    def pending(self):
+        with self._cv:
+            return sum(len(i.queue) for i in self._links.values())
+
+    def flush(self):
+        # Block until everything queued so far has been acked or given up on
+        with self._cv:
+            while self._running and any(i.queue for i in self._links.values()):
+                self._cv.wait()
+
+    def delivered(self, node):
+        # Highest sequence number the node has acknowledged, -1 for none
+        with self._cv:
+            link = self._links.get(node.address)
+            return -1 if link is None else link.acked
+
+    def _next_burst(self):
+        burst = []
+        size = 0
+        flow = self.master.flow
+        with self._cv:
+            while True:
+                while self._running and not self._ready:
+                    self._cv.wait()
+                now = time.monotonic()
+                for _ in range(len(self._ready)):
+                    if len(burst) >= self.window:
+                        break
+                    address = self._ready[0]
+                    link = self._links[address]
+                    if burst and size + len(link.queue[0].frame) + 3 > G6_BRIDGE_BUFFER:
+                        break
+                    self._ready.rotate(-1)
+                    if not flow.take(address, now):
+                        continue
+                    self._ready.pop()
+                    burst.append((address, link.queue[0]))
+                    size += len(link.queue[0].frame) + 3
+                if burst or not self._running:
+                    return burst
+                self._cv.wait(max(0.001, min(flow.wait_time(i, now) for i in self._ready)))
+
+    def _run(self):
+        while True:
+            burst = self._next_burst()
+            if not burst:
+                if not self._running:
+                    return
+                continue
+
+            try:
+                outcomes = self._transmit(burst)
+            except (TimeoutError, G6Error) as e:
+                print(f"W: Reliable burst failed ({e!r})")
+                outcomes = [_RESEND] * len(burst)
+
+            with self._cv:
+                for (address, item), outcome in zip(burst, outcomes):
+                    self._settle(address, item, outcome)
+                self._cv.notify_all()
+
+    def _transmit(self, burst):
+        master = self.master
+        outcomes = []
+        with master.lock:
+            # Refusals of fire-and-forget frames would be read as this burst's
+            master._drain()
+            master._pace()
+            master.com.write_many(item.frame for _, item in burst)
+            self.sent += len(burst)
+
+            # Read every slot, even after a bad one, to stay aligned
+            for _ in burst:
+                outcomes.append(self._outcome(lambda: G6PacketIn.from_serial(master.com)))
+
+            # A damaged answer means the node did act on the frame, so ask it
+            # what it said rather than risk sending the frame twice
+            for idx, (address, _) in enumerate(burst):
+                if outcomes[idx] != _UNSURE:
+                    continue
+                request = G6PacketOut(address, (G6_CMD_REQUEST_RETRANSMIT, b""))
+                for _ in range(self.retries):
+                    master.com.write(request)
+                    outcomes[idx] = self._outcome(lambda: wait_resp(master.com))
+                    if outcomes[idx] != _UNSURE:
+                        break
+                if outcomes[idx] == _ACKED:
+                    self.recovered += 1
+                elif outcomes[idx] == _UNSURE:
+                    outcomes[idx] = _RESEND
+
+            for idx, (address, _) in enumerate(burst):
+                if outcomes[idx] == _HELD:
+                    master.flow.congested(address)
+        return outcomes
+
+    @staticmethod
+    def _outcome(read):
+        try:
+            pkt = read()
+        except G6ChecksumError:
+            return _UNSURE
+        except TimeoutError:
+            # Nothing came back at all; the frame most likely never arrived
+            return _RESEND
+        except G6Error:
+            return _RESEND
+        if pkt.status == G6_STATUS_OK:
+            return _ACKED
+        if pkt.status == G6_STATUS_OVERFLOW:
+            return _HELD
+        return _RESEND
+
+    def _settle(self, address, item, outcome):
+        # Caller holds the condition
+        link = self._links[address]
+        if outcome == _ACKED:
+            link.acked = item.seq
+            link.queue.popleft()
+            self.acked += 1
+        elif outcome == _HELD:
+            # The node is busy, not the link lossy; it goes again once flow
+            # control lets it, without using up a retry
+            self.held += 1
+        else:
+            item.tries += 1
+            if item.tries > self.retries:
+                print(f"W: Gave up on frame {item.seq} to node {address}")
+                link.queue.popleft()
+                self.lost += 1
+            else:
+                self.retransmits += 1
+        if link.queue:
+            self._ready.append(address)
+
+    def stats(self):
+        with self._cv:
+            return {
+                "sent": self.sent,
+                "acked": self.acked,
+                "retransmits": self.retransmits,
+                "recovered": self.recovered,
+                "lost": self.lost,
+                "held": self.held,
+                "pending": sum(len(i.queue) for i in self._links.values()),
+            }
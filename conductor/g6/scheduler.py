@@ -0,0 +1,234 @@
+import collections
+import concurrent.futures
+import threading
+import time
+
+from .error import G6Error
+from .const import (
+    G6_PRIORITY_NOTE, G6_PRIORITY_LIGHT, G6_PRIORITY_NAMES, G6_LIGHT_QUEUE_LIMIT,
+    G6_BRIDGE_BUFFER, G6_FLOW_DRAIN_INTERVAL
+)
+
+
+class _TxItem:
+    __slots__ = ("data", "enqueued", "future")
+
+    def __init__(self, data, future):
+        self.data = data
+        self.enqueued = time.monotonic()
+        self.future = future
+
+
+class _WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait):
+        self.count += 1
+        self.total += wait
+        if wait > self.max:
+            self.max = wait
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class G6TxScheduler:
+    """
+    Single transmit thread for a G6Master. Frames are queued per priority
+    class and per node; the thread always serves the most urgent class first
+    and round-robins between nodes within it. Light queues are bounded, so
+    under saturation it is lighting that gets dropped, never notes. Once
+    stopped, whatever flow control was still holding back is sent before the
+    thread exits, and nothing more is taken.
+    """
+
+    def __init__(self, master, light_limit=G6_LIGHT_QUEUE_LIMIT):
+        from .master import G6Master
+
+        self.master: G6Master = master
+        self.light_limit = light_limit
+
+        classes = len(G6_PRIORITY_NAMES)
+        self._queues = [{} for _ in range(classes)]
+        self._ready = [collections.deque() for _ in range(classes)]
+        self._depth = [0] * classes
+        self._waits = [_WaitStats() for _ in range(classes)]
+        self.dropped = 0
+
+        # Frames went out since refusals were last looked for
+        self._undrained = False
+        self._last_drain = time.monotonic()
+
+        self._cv = threading.Condition()
+        self._running = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="g6-tx", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cv:
+            self._running = False
+            self._stopped = True
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, address, data, priority=G6_PRIORITY_NOTE, response=False):
+        future = concurrent.futures.Future() if response else None
+        item = _TxItem(bytes(data), future)
+
+        with self._cv:
+            if self._stopped:
+                raise G6Error("TX scheduler has stopped")
+            queue = self._queues[priority].get(address)
+            if queue is None:
+                queue = self._queues[priority][address] = collections.deque()
+            if not queue:
+                self._ready[priority].append(address)
+            queue.append(item)
+            self._depth[priority] += 1
+
+            if priority == G6_PRIORITY_LIGHT and len(queue) > self.light_limit:
+                stale = queue.popleft()
+                self._depth[priority] -= 1
+                self.dropped += 1
+                if stale.future is not None:
+                    stale.future.cancel()
+
+            self._cv.notify()
+        return future
+
+    def _pop(self, now, hold=True):
+        # With hold=False flow control is ignored
+        flow = self.master.flow
+        for priority, ready in enumerate(self._ready):
+            for _ in range(len(ready)):
+                address = ready.popleft()
+                if not hold or flow.take(address, now):
+                    break
+                # Held back by flow control; let the next node go first
+                ready.append(address)
+            else:
+                continue
+            queue = self._queues[priority][address]
+            item = queue.popleft()
+            if queue:
+                ready.append(address)
+            self._depth[priority] -= 1
+            wait = time.monotonic() - item.enqueued
+            self._waits[priority].add(wait)
+            self.master.stats.record("queue_wait", int(wait * 1e9), G6_PRIORITY_NAMES[priority])
+            return item
+        return None
+
+    def _next_burst(self):
+        # Take frames in priority order until the bridge's buffer is full or we
+        # reach an exchange, which ends the burst since it waits for a reply
+        burst = []
+        size = 0
+        with self._cv:
+            while True:
+                while self._running and not any(self._depth):
+                    if not self._undrained:
+                        self._cv.wait()
+                        continue
+                    # Come back to look for refusals once they'd be in
+                    self._cv.wait(self.master.reply_wait())
+                    if not any(self._depth):
+                        return burst
+                now = time.monotonic()
+                while True:
+                    # Stopping flushes what's left, held back or not, so no
+                    # exchange is left waiting on a future nobody resolves
+                    item = self._pop(now, self._running)
+                    if item is None:
+                        break
+                    burst.append(item)
+                    size += len(item.data) + 3
+                    if item.future is not None or size >= G6_BRIDGE_BUFFER:
+                        break
+                if burst or not self._running:
+                    return burst
+                # Everything queued is for nodes being held back
+                self._cv.wait(self._hold_time(now))
+
+    def _hold_time(self, now):
+        flow = self.master.flow
+        return max(0.001, min(
+            flow.wait_time(address, now) for ready in self._ready for address in ready
+        ))
+
+    def _run(self):
+        while True:
+            burst = self._next_burst()
+            if not burst:
+                if not self._running:
+                    return
+                self._drain()
+                continue
+
+            last = burst[-1]
+            if last.future is not None:
+                frames, exchange = burst[:-1], last
+            else:
+                frames, exchange = burst, None
+
+            try:
+                if frames:
+                    self.master.write_many(i.data for i in frames)
+                    self._undrained = True
+            except Exception as e:
+                print(f"W: TX burst failed ({e!r})")
+
+            if exchange is not None and exchange.future.set_running_or_notify_cancel():
+                try:
+                    exchange.future.set_result(self.master.exchange(exchange.data))
+                    self._undrained = False
+                except Exception as e:
+                    exchange.future.set_exception(e)
+            elif time.monotonic() - self._last_drain > G6_FLOW_DRAIN_INTERVAL:
+                self._drain(wait=True)
+            elif not any(self._depth):
+                self._drain()
+
+    def _drain(self, wait=False):
+        # Notes get no answer unless a node refuses them, so look for
+        # refusals whenever the bus goes quiet (and now and then when it
+        # doesn't) for flow control to act on. When quiet, answers still on
+        # their way aren't waited for; the TX thread comes back for them.
+        if not self._undrained:
+            return
+        try:
+            if not self.master.drain(wait):
+                return
+        except Exception as e:
+            print(f"W: Drain failed ({e!r})")
+        self._undrained = False
+        self._last_drain = time.monotonic()
+
+    def depths(self):
+        with self._cv:
+            return dict(zip(G6_PRIORITY_NAMES, self._depth))
+
+    def stats(self):
+        with self._cv:
+            return {
+                "depth": dict(zip(G6_PRIORITY_NAMES, self._depth)),
+                "wait": {
+                    name: waits.as_dict()
+                    for name, waits in zip(G6_PRIORITY_NAMES, self._waits)
+                },
+                "dropped": self.dropped,
+            }
@@ -0,0 +1,445 @@
+import collections
+import random
+import struct
+import threading
+import time
+
+from .const import (
+    G6_SYNC, G6_MARK, G6_NODE_MASTER, G6_NODE_BROADCAST, G6_VERSION_CMD, G6_VERSION_G6,
+    G6_VERSION_COMM, G6_STATUS_OK, G6_STATUS_UKCOM, G6_STATUS_SUM, G6_STATUS_OVERFLOW,
+    G6_REPORT_OK, G6_FEATURE_NOTE_CHANNEL, G6_FEATURE_EOF, G6_CMD_RESET, G6_CMD_RESET_CHECK,
+    G6_CMD_ASSIGN_ADDR, G6_CMD_READ_ID, G6_CMD_GET_CMD_VERSION, G6_CMD_GET_G6_VERSION,
+    G6_CMD_GET_COMM_VERSION, G6_CMD_GET_FEATURES, G6_CMD_REQUEST_RETRANSMIT,
+    G6_CMD_GRAPHENE_PING, G6_CMD_GRAPHENE_GET_SENSE, G6_CMD_GRAPHENE_INCR,
+    G6_CMD_GRAPHENE_CNTR, G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT,
+    G6_CMD_GRAPHENE_CONTROL
+)
+from .packet import escape
+
+
+# Payload length of every command a simulated node understands
+SIM_CMD_DATA_LEN = {
+    G6_CMD_RESET: 1,
+    G6_CMD_ASSIGN_ADDR: 1,
+    G6_CMD_READ_ID: 0,
+    G6_CMD_GET_CMD_VERSION: 0,
+    G6_CMD_GET_G6_VERSION: 0,
+    G6_CMD_GET_COMM_VERSION: 0,
+    G6_CMD_GET_FEATURES: 0,
+    G6_CMD_REQUEST_RETRANSMIT: 0,
+    G6_CMD_GRAPHENE_PING: 0,
+    G6_CMD_GRAPHENE_GET_SENSE: 0,
+    G6_CMD_GRAPHENE_INCR: 0,
+    G6_CMD_GRAPHENE_CNTR: 0,
+    G6_CMD_GRAPHENE_DOWN: 7,
+    G6_CMD_GRAPHENE_UP: 7,
+    G6_CMD_GRAPHENE_LIGHT: 7,
+    G6_CMD_GRAPHENE_CONTROL: 7,
+}
+
+SIM_DEFAULT_FEATURES = bytes([G6_FEATURE_NOTE_CHANNEL, 0, 0, 127, G6_FEATURE_EOF])
+
+
+class G6SimEvent:
+    __slots__ = ("at", "fire", "cmd", "time", "channel", "a", "b")
+
+    def __init__(self, at, cmd, time, channel, a, b, fire=None):
+        self.at = at
+        # When the node acts on it: on arrival, or at its timestamp once the
+        # node's clock has been zeroed
+        self.fire = at if fire is None else fire
+        self.cmd = cmd
+        self.time = time
+        self.channel = channel
+        self.a = a
+        self.b = b
+
+    def __repr__(self):
+        return f"<G6SimEvent {self.cmd:02x} t={self.time} ch={self.channel} {self.a} {self.b} @{self.at:.6f}>"
+
+
+class G6SimNode:
+    """
+    A virtual instrument. Answers the identification/feature/ping commands,
+    records every note/light/control it is sent, and can be told to fail a
+    proportion of frames with G6_STATUS_SUM, G6_STATUS_OVERFLOW or a corrupt
+    response checksum. With `max_rate` set it behaves like a slow instrument,
+    answering OVERFLOW to frames arriving faster than it can act on them.
+    G6_CMD_GRAPHENE_CNTR zeroes its clock; after that, events fire at their
+    timestamp rather than on arrival.
+    """
+
+    def __init__(self, ioident="Sim Node;1.0", features=SIM_DEFAULT_FEATURES, latency=0.0002,
+                 sum_error_rate=0.0, overflow_rate=0.0, corrupt_rate=0.0, max_rate=None, seed=None):
+        self.address = None
+        self.ioident = ioident
+        self.features = bytes(features)
+        self.latency = latency
+        self.sum_error_rate = sum_error_rate
+        self.overflow_rate = overflow_rate
+        self.corrupt_rate = corrupt_rate
+        self.max_rate = max_rate
+        self._busy_until = 0.0
+        self.rng = random.Random(seed)
+
+        self.counter = 0
+        self.epoch = None
+        self.events: list[G6SimEvent] = []
+        self._last_response = None
+
+    def reset(self):
+        self.address = None
+        self.counter = 0
+        self.epoch = None
+
+    def handle(self, cmds, valid, at):
+        if cmds and cmds[0][0] == G6_CMD_REQUEST_RETRANSMIT and valid:
+            return self._last_response
+        response = self._handle(cmds, valid, at)
+        if response is not None:
+            self._last_response = response
+        return response
+
+    def _handle(self, cmds, valid, at):
+        if not valid:
+            return G6_STATUS_SUM, b""
+        if self.overflow_rate and self.rng.random() < self.overflow_rate:
+            return G6_STATUS_OVERFLOW, b""
+        if self.max_rate:
+            if at < self._busy_until:
+                return G6_STATUS_OVERFLOW, b""
+            self._busy_until = at + 1 / self.max_rate
+        if self.sum_error_rate and self.rng.random() < self.sum_error_rate:
+            return G6_STATUS_SUM, b""
+
+        out = bytearray()
+        respond = False
+        for cmd, data in cmds:
+            if cmd == G6_CMD_READ_ID:
+                out.append(G6_REPORT_OK)
+                out += self.ioident.encode("latin-1")
+                respond = True
+            elif cmd == G6_CMD_GET_CMD_VERSION:
+                out += bytes([G6_REPORT_OK, G6_VERSION_CMD])
+                respond = True
+            elif cmd == G6_CMD_GET_G6_VERSION:
+                out += bytes([G6_REPORT_OK, G6_VERSION_G6])
+                respond = True
+            elif cmd == G6_CMD_GET_COMM_VERSION:
+                out += bytes([G6_REPORT_OK, G6_VERSION_COMM])
+                respond = True
+            elif cmd == G6_CMD_GET_FEATURES:
+                out.append(G6_REPORT_OK)
+                out += self.features
+                respond = True
+            elif cmd == G6_CMD_GRAPHENE_PING:
+                out.append(G6_REPORT_OK)
+                respond = True
+            elif cmd == G6_CMD_GRAPHENE_INCR:
+                self.counter += 1
+            elif cmd == G6_CMD_GRAPHENE_CNTR:
+                self.counter = 0
+                self.epoch = at
+            elif cmd in (G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT):
+                self.events.append(self._event(at, cmd, data))
+            elif cmd == G6_CMD_GRAPHENE_CONTROL:
+                self.events.append(self._event(at, cmd, data))
+                out.append(G6_REPORT_OK)
+                respond = True
+            else:
+                return G6_STATUS_UKCOM, b""
+
+        if not respond:
+            return None
+        return G6_STATUS_OK, bytes(out)
+
+    def _event(self, at, cmd, data):
+        time, channel, a, b = struct.unpack("<IBBB", data)
+        fire = None
+        if self.epoch is not None:
+            fire = max(at, self.epoch + time / 1000)
+        return G6SimEvent(at, cmd, time, channel, a, b, fire)
+
+
+class G6SimBus:
+    """
+    A chain of G6SimNodes behind a simulated bridge. `serial` speaks the
+    bridge's opcodes and can be handed to G6Com in place of a real port.
+
+    With realtime=True transfers take as long as they would at `baud`, plus
+    `usb_latency` each way between host and bridge, and the bridge thread
+    sleeps accordingly; otherwise time only advances virtually (see
+    `elapsed`), which is useful for fast functional runs.
+    """
+
+    def __init__(self, nodes=None, count=1, baud=115200, usb_latency=0.001, realtime=True):
+        if nodes is None:
+            nodes = [G6SimNode(seed=i) for i in range(count)]
+        self.nodes: list[G6SimNode] = list(nodes)
+        self.baud = baud
+        self.byte_time = 10 / baud
+        self.usb_latency = usb_latency
+        self.realtime = realtime
+        self.frames = 0
+        self.bad_frames = 0
+        self.serial = G6SimSerial(self)
+
+    @property
+    def elapsed(self):
+        return self.serial.elapsed
+
+    def com(self):
+        from .master import G6Com
+
+        return G6Com(None, self.baud, ser=self.serial)
+
+    def master(self, **kwargs):
+        from .master import G6Master
+
+        return G6Master(com=self.com(), **kwargs)
+
+    def close(self):
+        self.serial.close()
+
+    def _parse(self, frame):
+        body = bytearray()
+        escaped = False
+        for i in frame[1:]:
+            if escaped:
+                body.append((i + 1) & 0xff)
+                escaped = False
+            elif i == G6_MARK:
+                escaped = True
+            else:
+                body.append(i)
+        if len(body) < 3:
+            return None, [], False
+
+        valid = sum(body[:-1]) % 256 == body[-1] and body[1] == len(body) - 1
+        cmds = []
+        cur = 2
+        while cur < len(body) - 1:
+            cmd = body[cur]
+            size = SIM_CMD_DATA_LEN.get(cmd, 0)
+            cmds.append((cmd, bytes(body[cur + 1:cur + 1 + size])))
+            cur += 1 + size
+        return body[0], cmds, valid
+
+    def deliver(self, frame, at):
+        # Returns the (time, byte) stream the bus sends back to the bridge
+        self.frames += 1
+        if not frame or frame[0] != G6_SYNC:
+            self.bad_frames += 1
+            return []
+        dst, cmds, valid = self._parse(frame)
+        if not valid:
+            self.bad_frames += 1
+
+        if dst == G6_NODE_BROADCAST:
+            for cmd, data in cmds:
+                if cmd == G6_CMD_RESET and data == bytes([G6_CMD_RESET_CHECK]):
+                    for node in self.nodes:
+                        node.reset()
+                elif cmd == G6_CMD_ASSIGN_ADDR and valid:
+                    for node in self.nodes:
+                        if node.address is None:
+                            node.address = data[0]
+                            return self._respond(node, (G6_STATUS_OK, bytes([G6_REPORT_OK])), at)
+            return []
+
+        for node in self.nodes:
+            if node.address is not None and node.address == dst:
+                return self._respond(node, node.handle(cmds, valid, at), at)
+        return []
+
+    def _respond(self, node, response, at):
+        if response is None:
+            return []
+        status, data = response
+        dlen = len(data) + 2
+        check = (G6_NODE_MASTER + dlen + status + sum(data)) % 256
+        if node.corrupt_rate and node.rng.random() < node.corrupt_rate:
+            check ^= 0xff
+        raw = bytes([G6_SYNC]) + escape(bytes([G6_NODE_MASTER, dlen, status]) + data + bytes([check]))
+
+        start = at + node.latency
+        return [(start + i * self.byte_time, byte) for i, byte in enumerate(raw)]
+
+
+class G6SimSerial:
+    """
+    Enough of pyserial's Serial for G6Com, backed by a bridge thread that
+    executes the `\\0` (write frame, ack 0xE0) and `\\1` (timed read) opcodes.
+
+    Every host write and every bridge answer is stamped with the time it
+    crosses the USB link, so a round trip costs 2 * usb_latency however few
+    bytes it carries.
+    """
+
+    def __init__(self, bus: G6SimBus):
+        self.bus = bus
+        self.timeout = None
+        self._cv = threading.Condition()
+        # Byte streams plus (end offset, time the bytes up to it arrive) marks
+        self._from_host = bytearray()
+        self._from_host_marks = collections.deque()
+        self._to_host = bytearray()
+        self._to_host_marks = collections.deque()
+        self._from_bus = collections.deque()
+        self._start = time.monotonic()
+        self._t = self._start
+        self._open = True
+        self._thread = threading.Thread(target=self._bridge, name="g6-sim-bridge", daemon=True)
+        self._thread.start()
+
+    @property
+    def elapsed(self):
+        return self._t - self._start
+
+    def _now(self):
+        return time.monotonic() if self.bus.realtime else float("inf")
+
+    def _readable(self, now):
+        ready = 0
+        for end, at in self._to_host_marks:
+            if at > now:
+                break
+            ready = end
+        return ready
+
+    def _next_arrival(self, now):
+        for _, at in self._to_host_marks:
+            if at > now:
+                return at
+        return None
+
+    @property
+    def in_waiting(self):
+        with self._cv:
+            return self._readable(self._now())
+
+    def write(self, data):
+        with self._cv:
+            self._from_host += data
+            self._from_host_marks.append((len(self._from_host), time.monotonic() + self.bus.usb_latency))
+            self._cv.notify_all()
+        return len(data)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cv:
+            while self._open:
+                if self._readable(self._now()) >= size:
+                    break
+                now = time.monotonic()
+                wake = self._next_arrival(now) if self.bus.realtime else None
+                if deadline is not None:
+                    if now >= deadline:
+                        break
+                    wake = deadline if wake is None else min(wake, deadline)
+                self._cv.wait(None if wake is None else wake - now)
+
+            size = min(size, self._readable(self._now()))
+            data = bytes(self._to_host[:size])
+            del self._to_host[:size]
+            self._to_host_marks = collections.deque(
+                (end - size, at) for end, at in self._to_host_marks if end > size
+            )
+            return data
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._cv:
+            self._to_host.clear()
+            self._to_host_marks.clear()
+
+    def close(self):
+        with self._cv:
+            self._open = False
+            self._cv.notify_all()
+        self._thread.join()
+
+    def _take(self, size):
+        # Consume `size` bytes from the host stream, returning them and when
+        # the last of them reached the bridge
+        data = bytes(self._from_host[:size])
+        del self._from_host[:size]
+        arrived = None
+        marks = collections.deque()
+        for end, at in self._from_host_marks:
+            if arrived is None and end >= size:
+                arrived = at
+            if end > size:
+                marks.append((end - size, at))
+        self._from_host_marks = marks
+        return data, arrived
+
+    def _next_command(self):
+        buf = self._from_host
+        if not buf:
+            return None
+        if buf[0] == 0:
+            if len(buf) < 3:
+                return None
+            size = (buf[1] << 8) | buf[2]
+            if len(buf) < 3 + size:
+                return None
+            data, arrived = self._take(3 + size)
+            return 0, data[3:], arrived
+        if buf[0] == 1:
+            if len(buf) < 3:
+                return None
+            data, arrived = self._take(3)
+            return 1, ((data[1] << 8) | data[2]) / 1000, arrived
+        self._take(1)
+        return None
+
+    def _bridge(self):
+        while True:
+            with self._cv:
+                while self._open and (cmd := self._next_command()) is None:
+                    self._cv.wait()
+                if not self._open:
+                    return
+
+            op, arg, arrived = cmd
+            if self.bus.realtime:
+                self._t = max(self._t, arrived)
+            else:
+                self._t += self.bus.usb_latency
+
+            if op == 0:
+                self._bridge_write(arg)
+            else:
+                self._bridge_read(arg)
+
+    def _emit(self, data):
+        if self.bus.realtime:
+            delay = self._t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        with self._cv:
+            self._to_host += data
+            self._to_host_marks.append((len(self._to_host), self._t + self.bus.usb_latency))
+            self._cv.notify_all()
+
+    def _bridge_write(self, frame):
+        byte_time = self.bus.byte_time
+        # Host link, then the bus itself
+        self._t += (3 + len(frame)) * byte_time
+        self._t += len(frame) * byte_time
+        self._from_bus.extend(self.bus.deliver(frame, self._t))
+        self._t += byte_time
+        self._emit(b"\xE0")
+
+    def _bridge_read(self, timeout):
+        deadline = self._t + timeout
+        if self._from_bus and self._from_bus[0][0] <= deadline:
+            at, byte = self._from_bus.popleft()
+            self._t = max(self._t, at) + 2 * self.bus.byte_time
+            self._emit(bytes([0x00, byte]))
+        else:
+            self._t = deadline + self.bus.byte_time
+            self._emit(b"\x01")
@@ -0,0 +1,137 @@
+import bisect
+import threading
+import time
+
+from .const import G6_STATS_BUCKETS
+
+
+class G6Histogram:
+    """
+    Fixed-bucket latency histogram. `bounds` are upper edges in ns; anything
+    slower lands in the last, open-ended bucket. Recording takes no lock, so
+    under heavy contention a count can occasionally be lost, which is fine
+    for monitoring.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds=G6_STATS_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[bisect.bisect_left(self.bounds, ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        # Upper edge of the bucket holding the p-th percentile, in ns
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.bounds[idx] if idx < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000 if self.count else 0.0,
+            "p50_us": self.percentile(50) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max / 1000,
+            "buckets": dict(zip([f"<={i // 1000}us" for i in self.bounds] + ["more"], self.counts)),
+        }
+
+
+class G6Stats:
+    """
+    Counters and latency histograms for one bus. Histograms are keyed by a
+    name plus an optional key (node address, command byte, ...), created on
+    first use. Counters are bumped from the TX, sync and caller threads
+    alike, so unlike histograms they are kept exact under a lock.
+    """
+
+    def __init__(self, baud=None):
+        self.baud = baud
+        self.started = time.monotonic()
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[tuple, G6Histogram] = {}
+        self._lock = threading.Lock()
+        self._dumper = None
+        self._stop = threading.Event()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, ns, key=None):
+        hist = self.histograms.get((name, key))
+        if hist is None:
+            hist = self.histograms.setdefault((name, key), G6Histogram())
+        hist.record(ns)
+
+    def reset(self):
+        self.started = time.monotonic()
+        with self._lock:
+            self.counters = {}
+        self.histograms = {}
+
+    def _counters(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def utilisation(self):
+        # Share of the elapsed time the wire spent carrying our bytes
+        if not self.baud:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        wire = self.counters.get("bytes_out", 0) + self.counters.get("bytes_in", 0)
+        return wire * 10 / self.baud / elapsed if elapsed else 0.0
+
+    def snapshot(self):
+        histograms = {}
+        for (name, key), hist in list(self.histograms.items()):
+            label = name if key is None else f"{name}[{key}]"
+            histograms[label] = hist.as_dict()
+        return {
+            "uptime": time.monotonic() - self.started,
+            "utilisation": self.utilisation(),
+            "counters": self._counters(),
+            "histograms": histograms,
+        }
+
+    def dump(self, out=print):
+        snap = self.snapshot()
+        out(f"G6 stats after {snap['uptime']:.1f}s, bus {snap['utilisation'] * 100:.1f}% busy")
+        for name, value in sorted(snap["counters"].items()):
+            out(f"  {name:<24} {value}")
+        for name, hist in sorted(snap["histograms"].items()):
+            out(
+                f"  {name:<24} n={hist['count']:<7} mean={hist['mean_us']:8.1f}us "
+                f"p50<={hist['p50_us']:.0f}us p99<={hist['p99_us']:.0f}us max={hist['max_us']:.0f}us"
+            )
+
+    def start_dump(self, interval, out=print):
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.dump(out)
+
+        self._dumper = threading.Thread(target=run, name="g6-stats", daemon=True)
+        self._dumper.start()
+
+    def stop_dump(self):
+        self._stop.set()
+        if self._dumper is not None:
+            self._dumper.join()
+            self._dumper = None
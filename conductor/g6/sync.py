@@ -0,0 +1,156 @@
+import collections
+import threading
+import time
+
+from .const import G6_CMD_GRAPHENE_PING, G6_SYNC_INTERVAL, G6_SYNC_SAMPLES
+from .error import G6Error
+
+
+class G6ClockEstimate:
+    """
+    Fitted timing of one node: one-way delay at `reference` (monotonic ns)
+    and how fast it is drifting, in seconds per second.
+    """
+
+    __slots__ = ("latency", "drift", "reference", "samples", "min_rtt")
+
+    def __init__(self, latency, drift, reference, samples, min_rtt):
+        self.latency = latency
+        self.drift = drift
+        self.reference = reference
+        self.samples = samples
+        self.min_rtt = min_rtt
+
+    def predict(self, at_ns=None):
+        # One-way delay expected at `at_ns`, defaulting to now
+        at_ns = time.monotonic_ns() if at_ns is None else at_ns
+        return max(0.0, self.latency + self.drift * (at_ns - self.reference) / 1e9)
+
+    def __repr__(self):
+        return (
+            f"<G6ClockEstimate {self.latency * 1000:.3f}ms "
+            f"drift={self.drift * 1e6:+.1f}us/s n={self.samples}>"
+        )
+
+
+class _Samples:
+    def __init__(self, size):
+        self.points = collections.deque(maxlen=size)
+
+    def add(self, mid, rtt):
+        self.points.append((mid, rtt))
+
+    def fit(self):
+        # Queueing only ever adds delay, so the fastest round trips are the
+        # truest. Keep the quickest half, then fit a line through them.
+        points = sorted(self.points, key=lambda i: i[1])
+        best = points[:max(1, len(points) // 2)]
+        min_rtt = best[0][1]
+        if len(best) < 2:
+            return G6ClockEstimate(min_rtt / 2e9, 0.0, best[0][0], len(self.points), min_rtt / 1e9)
+
+        n = len(best)
+        mean_t = sum(i[0] for i in best) / n
+        mean_d = sum(i[1] for i in best) / n
+        var = sum((i[0] - mean_t) ** 2 for i in best)
+        slope = 0.0
+        if var:
+            slope = sum((i[0] - mean_t) * (i[1] - mean_d) for i in best) / var
+        # Round trip is twice the one-way delay, in ns on both axes
+        return G6ClockEstimate(mean_d / 2e9, slope / 2, int(mean_t), len(self.points), min_rtt / 1e9)
+
+
+class G6ClockSync:
+    """
+    Background service keeping each node's timing estimate current over a
+    long performance. Pings go out only while the TX queues are empty, one
+    node per tick, and each estimate is refitted from that node's recent
+    round trips. The fitted delay is published to node.latency, which is
+    what node.offset and the scheduler work from, and listeners are called
+    with (node, estimate) whenever it changes.
+    """
+
+    def __init__(self, master, interval=G6_SYNC_INTERVAL, samples=G6_SYNC_SAMPLES):
+        from .master import G6Master
+
+        self.master: G6Master = master
+        self.interval = interval
+        self.size = samples
+
+        self._samples: dict[int, _Samples] = {}
+        self._estimates: dict[int, G6ClockEstimate] = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next = 0
+
+        self.pings = 0
+        self.skipped = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="g6-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def estimate(self, node):
+        with self._lock:
+            return self._estimates.get(node.address)
+
+    def estimates(self):
+        with self._lock:
+            return dict(self._estimates)
+
+    def _idle(self):
+        master = self.master
+        if master.scheduler is not None and any(master.scheduler.depths().values()):
+            return False
+        if master.reliable is not None and master.reliable.pending():
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            nodes = self.master.nodes
+            if not nodes:
+                continue
+            if not self._idle():
+                self.skipped += 1
+                continue
+            node = nodes[self._next % len(nodes)]
+            self._next += 1
+            self.sample(node)
+
+    def sample(self, node):
+        frame = bytes(node.packet((G6_CMD_GRAPHENE_PING, b"")))
+        start = time.monotonic_ns()
+        try:
+            self.master.exchange(frame)
+        except (TimeoutError, G6Error):
+            return None
+        end = time.monotonic_ns()
+        self.pings += 1
+
+        with self._lock:
+            samples = self._samples.get(node.address)
+            if samples is None:
+                samples = self._samples[node.address] = _Samples(self.size)
+            samples.add((start + end) // 2, end - start)
+            estimate = self._estimates[node.address] = samples.fit()
+        node.latency = estimate.latency
+        for listener in list(self._listeners):
+            listener(node, estimate)
+        return estimate
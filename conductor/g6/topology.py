@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+
+from .node import G6Node
+
+
+# Buses in a cluster share one cache file
+_lock = threading.Lock()
+
+
+def node_to_dict(node: G6Node):
+    return {
+        "address": node.address,
+        "ioident": node.ioident,
+        "cmd_version": node.cmd_version,
+        "g6_version": node.g6_version,
+        "comm_version": node.comm_version,
+        "features": bytes(node.features).hex(),
+        "latency": node.latency,
+    }
+
+
+def node_from_dict(master, entry) -> G6Node:
+    node = G6Node(master, entry["address"])
+    node.ioident = entry["ioident"]
+    node.cmd_version = entry["cmd_version"]
+    node.g6_version = entry["g6_version"]
+    node.comm_version = entry["comm_version"]
+    node.features = bytearray.fromhex(entry["features"])
+    node.latency = entry["latency"]
+    return node
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_topology(path, bus):
+    with _lock:
+        return _read(path).get(str(bus))
+
+
+def save_topology(path, bus, nodes):
+    with _lock:
+        data = _read(path)
+        data[str(bus)] = [node_to_dict(i) for i in nodes]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
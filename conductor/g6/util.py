@@ -1,6 +1,8 @@
+import time
+
 from .packet import G6PacketIn
 from .const import G6_TIMEOUT, G6_RESEND_RETRIES, G6_STATUS_OK, G6_STATUS_SUM
-from .error import G6StatusNack
+from .error import G6StatusNack, G6ChecksumError
 
 
 def wait_resp(com_or_node, timeout=G6_TIMEOUT, retries=G6_RESEND_RETRIES) -> G6PacketIn:
@@ -15,9 +17,24 @@ def wait_resp(com_or_node, timeout=G6_TIMEOUT, retries=G6_RESEND_RETRIES) -> G6P
 
     if com.timeout != timeout:
         com.timeout = timeout
-    pkt = G6PacketIn.from_serial(com)
+    start = time.perf_counter_ns()
+    try:
+        pkt = G6PacketIn.from_serial(com)
+    except G6ChecksumError:
+        com.stats.incr("bad_checksum")
+        if node is not None and retries:
+            com.stats.incr("resend_checksum")
+            node.resend()
+            return wait_resp(com_or_node, timeout, retries - 1)
+        raise
+    except TimeoutError:
+        com.stats.incr("timeouts")
+        raise
+    com.stats.record("wait_resp", time.perf_counter_ns() - start, None if node is None else node.address)
     if pkt.status != G6_STATUS_OK:
+        com.stats.incr(f"status_{pkt.status:02x}")
         if pkt.status == G6_STATUS_SUM and node is not None and retries:
+            com.stats.incr("resend_sum")
             node.resend()
             return wait_resp(com_or_node, timeout, retries - 1)
         raise G6StatusNack(pkt)
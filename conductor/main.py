@@ -1,11 +1,8 @@
-from midiparse import (
-    midi_parse, MidiMixer,
+from g6 import G6Master, G6Cluster
+from g6.const import G6_TOPOLOGY_CACHE, G6_LOOKAHEAD_WINDOW
+from player import LivePlayer, Playlist, Router, SeekPlayer, load_or_compile, open_source
 
-    MetaEventType, MidiEventType, MidiTrackEventType
-)
-from g6 import G6Node, G6Master
-
-import time
+import sys
 
 
 # TODO: Fetch from g6
@@ -148,42 +145,12 @@ MIDI_PROGAM_NAMES = [
 ]
 
 
-def load_midi(filename):
-    with open(filename, "rb") as midifile:
-        hdr, trks = midi_parse(midifile.read())
-
-    tracks = {}
-    for track in trks:
-        name = None
-        channels = {}
-        for _, event in track:
-            type_ = event.track_ev_type
-            match type_:
-                case MidiTrackEventType.Meta:
-                    track_ev = event.track_ev
-                    if track_ev.ev_type == MetaEventType.TrackName:
-                        name = track_ev.tag
-                case MidiTrackEventType.Midi:
-                    channels.setdefault(event.track_ev.channel, -1)
-                    if event.track_ev.ev_type == MidiEventType.ProgramChange:
-                        channels[event.track_ev.channel] = event.track_ev.tag
-
-        tracks[track] = (name, channels)
-
-    mixer = MidiMixer.for_track(hdr, trks)
-    return tracks, mixer
-
-    for timestamp, evt in mixer:
-        if evt.track_ev_type != MidiTrackEventType.Midi:
-            continue
-        track_ev = evt.track_ev
-        print(id(evt.track), track_ev.ev_type, track_ev.channel, track_ev.tag)
-
-
-def play(g6: G6Master):
-    # tracks, mixer = load_midi(r"C:\Users\Nathan\Downloads\Carol-Of-The-Bells-1.mid")
-    tracks, mixer = load_midi("../pirates-transposed.mid")
-    # tracks, mixer = load_midi("../pirates-reversed.mid")
+def play(g6: G6Master | G6Cluster, verbose=False, lookahead=0):
+    # The score is compiled against this topology once and cached; playing
+    # it again only loads the frames back
+    # plan = load_or_compile(r"C:\Users\Nathan\Downloads\Carol-Of-The-Bells-1.mid", g6, lookahead)
+    plan = load_or_compile("../pirates-transposed.mid", g6, lookahead)
+    # plan = load_or_compile("../pirates-reversed.mid", g6, lookahead)
 
     # for i in range(76, 108):
     #     g6.nodes[0].note_down(0, 0, i, 255)
@@ -193,59 +160,90 @@ def play(g6: G6Master):
 
     # quit()
 
-    mappings = {}
-    for (track, (name, channels)) in tracks.items():
-        for node in g6.nodes:
-            if node.name == name:
-                break
-        else:
-            print(f"Unable to allocate track: {name}")
-            # node = g6.nodes[0]
-            continue
-
-        mappings[track] = node
-
-    start = time.time()
-
-    for timestamp, evt in mixer:
-        delta = (timestamp / 1000) - (time.time() - start)
-        if delta > 0:
-            time.sleep(delta)
-
-        if evt.track_ev_type != MidiTrackEventType.Midi:
-            continue
-        track_ev = evt.track_ev
-
-        node: G6Node = mappings.get(evt.track)
-        if node is None:
-            continue
-
-        if track_ev.ev_type == MidiEventType.NoteOn:
-            note, vel = track_ev.tag
-            if vel == 0:
-                print("Up", node.name, track_ev.channel, note)
-                node.light(timestamp, track_ev.channel, note, 0)
-                node.note_up(timestamp, track_ev.channel, note, vel)
-            else:
-                print("Down", node.name, track_ev.channel, note)
-                node.light(timestamp, track_ev.channel, note, 255)
-                node.note_down(timestamp, track_ev.channel, note, vel)
-        elif track_ev.ev_type == MidiEventType.NoteOff:
-            print("Up", node.name, track_ev.channel, note)
-            note, vel = track_ev.tag
-            node.light(timestamp, track_ev.channel, note, 0)
-            node.note_up(timestamp, track_ev.channel, note, vel)
+    # Every bus is paced off the same clock so instruments stay together.
+    # With the TX scheduler running sends only enqueue, and frames that pile
+    # up while the bus is busy leave together in one transfer.
+    plan.play(g6, verbose)
+
+    wake = g6.clock.lateness.as_dict()
+    print(
+        f"Scheduler wake-ups: n={wake['count']} mean={wake['mean_us']:.1f}us "
+        f"p99<={wake['p99_us']:.0f}us max={wake['max_us']:.0f}us"
+    )
+
+
+def live(g6: G6Master | G6Cluster, source, routes=None):
+    # Rehearsal mode: whatever arrives on `source` is played as it comes in
+    router = Router(g6.nodes)
+    player = LivePlayer(router, routes)
+    print(f"Playing live MIDI from {source}")
+    player.serve(open_source(source))
+
+
+def playlist(g6: G6Master | G6Cluster, files, verbose=False, lookahead=0):
+    # Back to back in one session; each piece is compiled while the one
+    # before it plays
+    Playlist(g6, files, lookahead).play(verbose)
+
+
+def rehearse(g6: G6Master | G6Cluster, filename, at, verbose=False, lookahead=0):
+    # Start `at` seconds in, with held notes and controllers caught up
+    SeekPlayer(g6, filename, lookahead).play(round(at * 1000), verbose)
 
 
 def main():
-    g6 = G6Master()
-    g6.enumerate_bus()
+    # python main.py a.mid --from=SECONDS          plays a.mid from that point
+    # python main.py a.mid b.mid ...             plays those files back to back
+    # python main.py source [channel=instrument ...]
+    #                                             plays live MIDI from `source`
+    #                                             (see open_source())
+    # With no arguments, plays the file in play()
+    # --lookahead[=SECONDS] streams score events ahead of time for the nodes
+    # to fire themselves. Only for instruments whose firmware acts on event
+    # timestamps; the rest would play everything that much early.
+    options = {}
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            args.append(arg)
+    lookahead = 0
+    if "lookahead" in options:
+        lookahead = float(options["lookahead"] or G6_LOOKAHEAD_WINDOW)
+    files = [i for i in args if i.lower().endswith((".mid", ".midi"))]
+    routes = {}
+    if args and not files:
+        for arg in args[1:]:
+            channel, _, name = arg.partition("=")
+            routes[int(channel)] = name
+    if "from" in options and len(files) != 1:
+        sys.exit("--from takes exactly one file")
+
+    g6 = G6Cluster()
+    g6.enumerate_bus(cache=G6_TOPOLOGY_CACHE)
+    g6.start_scheduler()
+    g6.start_sync()
 
     try:
-        play(g6)
+        if files and "from" in options:
+            rehearse(g6, files[0], float(options["from"]), lookahead=lookahead)
+        elif files:
+            playlist(g6, files, lookahead=lookahead)
+        elif args:
+            live(g6, args[0], routes)
+        else:
+            play(g6, lookahead=lookahead)
     except KeyboardInterrupt:
         print("Shutting down")
+        g6.stop_sync()
+        g6.stop_scheduler()
         g6.reset()
+    finally:
+        g6.stop_sync()
+        g6.stop_scheduler()
+        g6.dump_stats()
 
 
 if __name__ == "__main__":
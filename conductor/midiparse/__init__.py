@@ -175,6 +175,7 @@ class MidiTrack:
 
     def __iter__(self):
         self.total_ticks = 0
+        self.end_ticks = 0
         self.cur = 0
         self.running_status = None
         return self
@@ -184,6 +185,7 @@ class MidiTrack:
         self.cur += read
 
         if ev.track_ev_type == MidiTrackEventType.Meta and ev.track_ev.ev_type == MetaEventType.EndOfTrack:
+            self.end_ticks = dt
             raise StopIteration
 
         return dt, ev
@@ -451,6 +453,75 @@ class MidiTrack:
         return result, offset
 
 
+# Data bytes following each channel voice status, by its high nibble
+_MIDI_DATA_LENGTH = {0x8: 2, 0x9: 2, 0xa: 2, 0xb: 2, 0xc: 1, 0xd: 1, 0xe: 2}
+# ... and following each system common status (sysex runs to 0xf7)
+_MIDI_COMMON_LENGTH = {0xf1: 1, 0xf2: 2, 0xf3: 1}
+# Real-time messages are single bytes that may turn up anywhere, even in the
+# middle of another message
+_MIDI_REALTIME = bytes(range(0xf8, 0x100))
+
+
+class MidiStream(MidiTrack):
+    """
+    Incremental parser for a live MIDI byte stream, e.g. a keyboard bridged
+    to a socket. There are no chunks or delta times on the wire, so bytes are
+    fed in as they arrive and each complete channel message is parsed by
+    MidiTrack._parse_midi_event, running status and all. Real-time bytes are
+    dropped; sysex and system common messages are skipped.
+    """
+
+    def __init__(self):
+        super().__init__(None, bytearray())
+
+    def __iter__(self):
+        raise TypeError('MidiStream is fed, not iterated')
+
+    def _pending(self, cur: int, status: int) -> int:
+        # Bytes the message at `cur` needs, or 0 to skip one stray byte
+        if status == 0xf0:
+            end = self.source.find(0xf7, cur)
+            return 0 if end == -1 else end + 1 - cur
+        if status >= 0xf0:
+            return 1 + _MIDI_COMMON_LENGTH.get(status, 0)
+        if status & 0x80:
+            return 1 + _MIDI_DATA_LENGTH[status >> 4]
+        if self.running_status is None:
+            return 0
+        return _MIDI_DATA_LENGTH[self.running_status >> 4]
+
+    def feed(self, data: bytes) -> list[MidiTrackEvent]:
+        source = self.source
+        source += bytes(data).translate(None, _MIDI_REALTIME)
+
+        events = []
+        cur = 0
+        while cur < len(source):
+            status = source[cur]
+            need = self._pending(cur, status)
+            if not need:
+                if status == 0xf0:
+                    # Unterminated sysex; wait for the rest of it
+                    break
+                self._log(f'WARN: Dropping MIDI data byte without running status: {status:0x}')
+                cur += 1
+                continue
+            if len(source) - cur < need:
+                break
+
+            if status >= 0xf0:
+                self.running_status = None
+                cur += need
+                continue
+
+            track_ev, read = self._parse_midi_event(cur + 1, status)
+            cur += 1 + read
+            events.append(MidiTrackEvent(MidiTrackEventType.Midi, track_ev, self))
+
+        del source[:cur]
+        return events
+
+
 def _midi_read_header(source: bytes) -> tuple[MidiHeader, int]:
     magic = source[:4] # 4-bytes ascii 'MThd'
     assert magic == b'MThd', f'Bad MIDI header chunk magic. Expected \'MThd\', got \'{magic}\''
@@ -499,26 +570,39 @@ class MidiMixer:
         self.hdr = hdr
         self.trks = trks
 
+    @staticmethod
+    def ms(hdr: MidiHeader, tempo: int, dt: int) -> int:
+        match hdr.division:
+            case int(tpqn):
+                # tempo = uspqn
+                return int((float(dt) / (float(tpqn) / float(tempo))) / 1000.0)
+
+            case tuple(fps, tpf):
+                return int((float(dt) / (float(fps) * float(tpf))) * 1000.0)
+
     @classmethod
     def rebase(cls, hdr: MidiHeader, track: list[tuple[int, MidiTrackEvent]]):
         tempo = 500000 # uspqn, default = 120 bpm
 
-        def ms(hdr: MidiHeader, tempo: int, dt: int) -> int:
-            match hdr.division:
-                case int(tpqn):
-                    # tempo = uspqn
-                    return int((float(dt) / (float(tpqn) / float(tempo))) / 1000.0)
-
-                case tuple(fps, tpf):
-                    return int((float(dt) / (float(fps) * float(tpf))) * 1000.0)
-
         for dt, ev in track:
             match ev.track_ev_type:
                 case MidiTrackEventType.Meta:
                     if ev.track_ev.ev_type == MetaEventType.Tempo:
                         tempo = ev.track_ev.tag
 
-            yield ms(hdr, tempo, dt), ev
+            yield cls.ms(hdr, tempo, dt), ev
+
+    def length(self) -> int:
+        # Time of the last End of Track, so a rest after the final note
+        # counts too. Reads the tracks through again.
+        tempo = 500000
+        for _, ev in self:
+            if ev.track_ev_type == MidiTrackEventType.Meta and ev.track_ev.ev_type == MetaEventType.Tempo:
+                tempo = ev.track_ev.tag
+        return self.ms(self.hdr, tempo, self.end_ticks())
+
+    def end_ticks(self) -> int:
+        raise NotImplementedError
 
     @classmethod
     def for_track(cls, hdr: MidiHeader, trks: list[MidiTrack], *args, **kwargs):
@@ -544,6 +628,9 @@ class MultiChannelMidiMixer(MidiMixer):
     def __iter__(self):
         return MidiMixer.rebase(self.hdr, self.trks[0])
 
+    def end_ticks(self):
+        return self.trks[0].end_ticks
+
 
 class IndependentMidiMixer(MidiMixer):
     def __init__(self, *args, **kwargs):
@@ -557,6 +644,9 @@ class IndependentMidiMixer(MidiMixer):
 
         return MidiMixer.rebase(self.hdr, sorted(merged_track, key=lambda tup: tup[0]))
 
+    def end_ticks(self):
+        return max((trk.end_ticks for trk in self.trks), default=0)
+
 
 class SimultaneousMidiMixer(MidiMixer):
     def __init__(self, *args, **kwargs):
@@ -573,6 +663,16 @@ class SimultaneousMidiMixer(MidiMixer):
 
         return MidiMixer.rebase(self.hdr, merged_tracks)
 
+    def end_ticks(self):
+        absolute_offset = 0
+        end = 0
+        for trk in self.trks:
+            events = list(trk)
+            end = absolute_offset + trk.end_ticks
+            if events:
+                absolute_offset += events[-1][0]
+        return end
+
 
 if __name__ == '__main__':
     source = bytes([
@@ -0,0 +1,9 @@
+from .events import ScoreEvent, parse_midi, load_midi, score_events
+from .routing import Router, VoicePool, Voice
+from .coalesce import ScoreFrame, coalesce, split_frames
+from .lookahead import LookaheadPlayer
+from .live import LivePlayer, open_source
+from .merge import MergeScheduler
+from .plan import PerformancePlan, load_or_compile
+from .playlist import Playlist
+from .seek import ChaseState, SeekIndex, SeekPlayer, chase
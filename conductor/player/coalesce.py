@@ -0,0 +1,92 @@
+import collections
+
+from g6 import G6Node
+from g6.const import G6_COALESCE_QUANTUM, G6_COALESCE_MAX_FRAME
+
+
+# Sync, dst, len and checksum; then each command is its opcode and <IBBB
+_FRAME_OVERHEAD = 4
+_EVENT_SIZE = 8
+
+
+class ScoreFrame:
+    """
+    Score events for one node that leave together in a single frame. Each
+    keeps its own timestamp, so sharing a frame never moves when one fires;
+    `time` is the earliest of them.
+    """
+
+    __slots__ = ("time", "node", "events", "size")
+
+    def __init__(self, event):
+        self.time = event.time
+        self.node: G6Node = event.node
+        self.events = [event]
+        self.size = _FRAME_OVERHEAD + _EVENT_SIZE
+
+    def __len__(self):
+        return len(self.events)
+
+    def __repr__(self):
+        return f"<ScoreFrame {self.time}ms x{len(self.events)} -> {self.node.name}>"
+
+
+def coalesce(events, quantum=G6_COALESCE_QUANTUM, max_size=G6_COALESCE_MAX_FRAME):
+    """
+    Groups time-ordered score events into ScoreFrames: every event for a node
+    within `quantum` seconds of the first in its frame joins it, until the
+    frame would grow past `max_size` bytes. Events at the same time always
+    may. Frames are yielded in order of their first event; quantum=0 only
+    groups events at the same time.
+    """
+    quantum_ms = quantum * 1000
+    open_: dict[G6Node, ScoreFrame] = {}
+    # Every frame not yet yielded, oldest first. Any that is no longer open
+    # is finished.
+    pending = collections.deque()
+
+    for event in events:
+        frame = open_.get(event.node)
+        if frame is not None and (
+            _passed(event.time - frame.time, quantum_ms) or frame.size + _EVENT_SIZE > max_size
+        ):
+            frame = None
+        if frame is None:
+            frame = open_[event.node] = ScoreFrame(event)
+            pending.append(frame)
+        else:
+            frame.events.append(event)
+            frame.size += _EVENT_SIZE
+
+        # Frames whose quantum has passed can take nothing more
+        for node, other in list(open_.items()):
+            if _passed(event.time - other.time, quantum_ms):
+                del open_[node]
+        while pending and open_.get(pending[0].node) is not pending[0]:
+            yield pending.popleft()
+
+    yield from pending
+
+
+def _passed(elapsed, quantum_ms):
+    # Whether a frame opened `elapsed` ms ago can take nothing more
+    return elapsed > 0 and elapsed >= quantum_ms
+
+
+def split_frames(cmds, max_size=G6_COALESCE_MAX_FRAME):
+    """
+    Splits (cmd, data) pairs for one node into runs that each fit a frame of
+    `max_size` bytes, as coalesce() sizes them. A command too big on its own
+    still gets a frame of its own.
+    """
+    chunk = []
+    size = _FRAME_OVERHEAD
+    for cmd, data in cmds:
+        if chunk and size + 1 + len(data) > max_size:
+            yield chunk
+            chunk = []
+            size = _FRAME_OVERHEAD
+        chunk.append((cmd, data))
+        size += 1 + len(data)
+    if chunk:
+        yield chunk
@@ -0,0 +1,105 @@
+import collections
+
+from midiparse import midi_parse, MidiMixer, MetaEventType, MidiEventType, MidiTrackEventType
+from g6 import G6Node
+from g6.const import G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT
+
+
+class ScoreEvent:
+    """
+    One node command at a point in the score. `time` is in ms from the start
+    of the piece, the unit node timestamps are sent in.
+    """
+
+    __slots__ = ("time", "node", "cmd", "channel", "a", "b")
+
+    def __init__(self, time: int, node: G6Node, cmd: int, channel: int, a: int, b: int):
+        self.time = time
+        self.node = node
+        self.cmd = cmd
+        self.channel = channel
+        self.a = a
+        self.b = b
+
+    def __repr__(self):
+        return f"<ScoreEvent {self.time}ms {self.cmd:02x} ch={self.channel} {self.a} {self.b} -> {self.node.name}>"
+
+
+def parse_midi(data: bytes):
+    hdr, trks = midi_parse(data)
+
+    tracks = {}
+    for track in trks:
+        name = None
+        channels = {}
+        for _, event in track:
+            type_ = event.track_ev_type
+            match type_:
+                case MidiTrackEventType.Meta:
+                    track_ev = event.track_ev
+                    if track_ev.ev_type == MetaEventType.TrackName:
+                        name = track_ev.tag
+                case MidiTrackEventType.Midi:
+                    channels.setdefault(event.track_ev.channel, -1)
+                    if event.track_ev.ev_type == MidiEventType.ProgramChange:
+                        channels[event.track_ev.channel] = event.track_ev.tag
+
+        tracks[track] = (name, channels)
+
+    mixer = MidiMixer.for_track(hdr, trks)
+    return tracks, mixer
+
+
+def load_midi(filename):
+    with open(filename, "rb") as midifile:
+        return parse_midi(midifile.read())
+
+
+def score_events(mixer, mappings, router, reset=True):
+    # Turn the mixed MIDI stream into node commands: each note is given a
+    # voice from its track's instruments and lights its key as it plays. A
+    # NoteOn with zero velocity is a NoteOff. Notes no instrument can play
+    # are dropped here, and reported once at the end. reset=False keeps
+    # voices already handed out, e.g. to notes chased after a seek.
+    if reset:
+        router.reset()
+    rejected = collections.defaultdict(set)
+    for timestamp, evt in mixer:
+        if evt.track_ev_type != MidiTrackEventType.Midi:
+            continue
+        pool = mappings.get(evt.track)
+        if pool is None:
+            continue
+
+        track_ev = evt.track_ev
+        if track_ev.ev_type == MidiEventType.NoteOn:
+            note, vel = track_ev.tag
+            down = vel != 0
+        elif track_ev.ev_type == MidiEventType.NoteOff:
+            note, vel = track_ev.tag
+            down = False
+        else:
+            continue
+
+        if not pool.can_play(note):
+            rejected[pool.name].add(note)
+            continue
+
+        key = (evt.track, track_ev.channel, note)
+        if down:
+            voice, stolen = router.note_on(pool, key, note)
+        else:
+            voice, stolen = router.note_off(pool, key), None
+            if voice is None:
+                continue
+
+        node = voice.node
+        channel = track_ev.channel if voice.channel is None else voice.channel
+        if stolen is not None:
+            yield ScoreEvent(timestamp, node, G6_CMD_GRAPHENE_LIGHT, channel, stolen, 0)
+            yield ScoreEvent(timestamp, node, G6_CMD_GRAPHENE_UP, channel, stolen, 0)
+        yield ScoreEvent(timestamp, node, G6_CMD_GRAPHENE_LIGHT, channel, note, 255 if down else 0)
+        yield ScoreEvent(timestamp, node, G6_CMD_GRAPHENE_DOWN if down else G6_CMD_GRAPHENE_UP, channel, note, vel)
+
+    for name, notes in rejected.items():
+        print(f"W: {len(notes)} note{'s' if len(notes) != 1 else ''} out of range for {name}: {sorted(notes)}")
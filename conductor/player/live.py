@@ -0,0 +1,159 @@
+import os
+import selectors
+import socket
+import stat
+import struct
+import time
+
+from midiparse import MidiStream, MidiEventType
+from g6.const import (
+    G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT, G6_PRIORITY_NOTE,
+    G6_LIVE_READ_SIZE
+)
+
+from .routing import Router, VoicePool
+
+
+def _address(spec, default_host):
+    host, _, port = spec.rpartition(":")
+    return host or default_host, int(port)
+
+
+def open_source(spec):
+    """
+    Opens where live MIDI comes from:
+        udp:[host:]port    datagrams of raw MIDI
+        tcp:[host:]port    a listening socket; any number of connections
+        unix:path          a listening Unix socket
+        path               a named pipe, made if it doesn't exist
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(_address(rest, "127.0.0.1"))
+        return sock
+    if kind in ("tcp", "unix"):
+        if kind == "tcp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(_address(rest, "127.0.0.1"))
+        else:
+            if os.path.exists(rest):
+                os.unlink(rest)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(rest)
+        sock.listen()
+        return sock
+
+    if not os.path.exists(spec):
+        os.mkfifo(spec)
+    elif not stat.S_ISFIFO(os.stat(spec).st_mode):
+        print(f"W: {spec} is not a named pipe; reading it as one anyway")
+    # Opened read/write so the pipe stays open between writers
+    return os.open(spec, os.O_RDWR | os.O_NONBLOCK)
+
+
+class LivePlayer:
+    """
+    Plays a live MIDI stream straight onto the nodes. Each message is parsed
+    as soon as its last byte arrives and sent with a zero timestamp, so the
+    node acts on it on arrival; a note's light and strike share one frame.
+    MIDI channels are routed to instruments by `routes` (channel -> name),
+    every channel going to `default` if not listed.
+    """
+
+    def __init__(self, router: Router, routes=None, default=None):
+        self.router = router
+        self.routes: dict[int, VoicePool] = {}
+        for channel, name in (routes or {}).items():
+            self.routes[channel] = router.pools[name]
+        if default is None and router.pools:
+            default = next(iter(router.pools))
+        self.default = router.pools.get(default)
+
+        self.rejected = 0
+        self._streams: dict = {}
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def handle(self, stream: MidiStream, data, received_ns=None):
+        received_ns = time.monotonic_ns() if received_ns is None else received_ns
+        for evt in stream.feed(data):
+            track_ev = evt.track_ev
+            if track_ev.ev_type == MidiEventType.NoteOn:
+                note, vel = track_ev.tag
+                down = vel != 0
+            elif track_ev.ev_type == MidiEventType.NoteOff:
+                note, vel = track_ev.tag
+                down = False
+            else:
+                continue
+
+            pool = self.routes.get(track_ev.channel, self.default)
+            if pool is None or not pool.can_play(note):
+                self.rejected += 1
+                continue
+
+            key = (None, track_ev.channel, note)
+            if down:
+                voice, stolen = self.router.note_on(pool, key, note)
+            else:
+                voice, stolen = self.router.note_off(pool, key), None
+                if voice is None:
+                    continue
+
+            node = voice.node
+            channel = track_ev.channel if voice.channel is None else voice.channel
+            cmds = []
+            if stolen is not None:
+                cmds.append((G6_CMD_GRAPHENE_LIGHT, struct.pack("<IBBB", 0, channel, stolen, 0)))
+                cmds.append((G6_CMD_GRAPHENE_UP, struct.pack("<IBBB", 0, channel, stolen, 0)))
+            cmds.append((G6_CMD_GRAPHENE_LIGHT, struct.pack("<IBBB", 0, channel, note, 255 if down else 0)))
+            cmds.append((
+                G6_CMD_GRAPHENE_DOWN if down else G6_CMD_GRAPHENE_UP, struct.pack("<IBBB", 0, channel, note, vel)
+            ))
+            node.send(*cmds, priority=G6_PRIORITY_NOTE)
+            node.master.stats.record("live_forward", time.monotonic_ns() - received_ns, node.handle)
+
+    def serve(self, source, poll=0.1):
+        # Runs until stop(); `source` is whatever open_source() returned
+        self.router.reset()
+        self._stop = False
+        with selectors.DefaultSelector() as sel:
+            sel.register(source, selectors.EVENT_READ, "source")
+            while not self._stop:
+                for key, _ in sel.select(poll):
+                    self._ready(sel, key)
+            for key in list(sel.get_map().values()):
+                if key.data == "conn":
+                    key.fileobj.close()
+
+    def _ready(self, sel, key):
+        source = key.fileobj
+        if isinstance(source, int):
+            data = os.read(source, G6_LIVE_READ_SIZE)
+            self.handle(self._stream(source), data, time.monotonic_ns())
+        elif key.data == "source" and source.type == socket.SOCK_STREAM:
+            conn, _ = source.accept()
+            conn.setblocking(False)
+            sel.register(conn, selectors.EVENT_READ, "conn")
+        elif source.type == socket.SOCK_DGRAM:
+            data, sender = source.recvfrom(G6_LIVE_READ_SIZE)
+            self.handle(self._stream(sender), data, time.monotonic_ns())
+        else:
+            data = source.recv(G6_LIVE_READ_SIZE)
+            if not data:
+                sel.unregister(source)
+                source.close()
+                self._streams.pop(source, None)
+                return
+            self.handle(self._stream(source), data, time.monotonic_ns())
+
+    def _stream(self, key):
+        # Running status belongs to one sender, so each gets its own parser
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = MidiStream()
+        return stream
@@ -0,0 +1,128 @@
+import collections
+import struct
+import time
+
+from g6 import G6Node
+from g6.clock import G6Clock
+from g6.const import (
+    G6_CMD_GRAPHENE_LIGHT, G6_CMD_GRAPHENE_CNTR, G6_CMD_GRAPHENE_PING, G6_PRIORITY_NOTE,
+    G6_PRIORITY_LIGHT, G6_LOOKAHEAD_WINDOW, G6_NODE_EVENT_BUFFER, G6_COALESCE_QUANTUM,
+    G6_COALESCE_MAX_FRAME
+)
+
+from .coalesce import coalesce
+from .merge import MergeScheduler
+
+
+class LookaheadPlayer:
+    """
+    Streams score events to nodes `window` seconds before they are due and
+    lets each node's own clock fire them, so bus delays shorter than the
+    window never reach the audience. Node clocks are zeroed with
+    G6_CMD_GRAPHENE_CNTR as playback starts, and each timestamp is shifted
+    by how much later than the score's zero that node's clock started.
+
+    Events are sent in the order a MergeScheduler gives them, each node's
+    moved earlier by its offset so instruments with a slow action still
+    strike together with quick ones. Events for a node within `quantum` of
+    each other share one frame (see coalesce()). A node is never sent more
+    than `depth` events that haven't fired yet. With window=0 events go out
+    as they are due with their raw score timestamps, like a plain loop
+    would, and only those at the same time share a frame.
+    """
+
+    def __init__(
+        self, clock: G6Clock, window=G6_LOOKAHEAD_WINDOW, depth=G6_NODE_EVENT_BUFFER,
+        quantum=G6_COALESCE_QUANTUM, max_frame=G6_COALESCE_MAX_FRAME
+    ):
+        self.clock = clock
+        self.window = window
+        self.depth = depth
+        self.quantum = quantum
+        self.max_frame = max_frame
+        self.shift: dict[G6Node, int] = {}
+        self._requested: dict[G6Node, float] = {}
+        self._inflight: dict[G6Node, collections.deque] = {}
+
+    def start(self, nodes):
+        # The score starts one window from now, which gives the first events
+        # their full lead too. Each CNTR is timed to land one window before
+        # that, so node clocks are already running for events that have to
+        # fire ahead of the score, and shifts come out at about the window.
+        slowest = max((i.latency for i in nodes), default=0.0)
+        start = time.monotonic() + self.window + slowest
+        self.shift.clear()
+        self._inflight.clear()
+        for node in sorted(nodes, key=lambda i: -i.latency):
+            self._requested[node] = node.offset - node.latency
+            if self.window:
+                delay = start - self.window - node.latency - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                # The PING is answered once the CNTR has been acted on, however
+                # long the frame sat in the TX queue; the node's zero is
+                # about one latency before that answer got back
+                node.exchange((G6_CMD_GRAPHENE_CNTR, b""), (G6_CMD_GRAPHENE_PING, b""))
+                zero = time.monotonic() - node.latency
+                self.shift[node] = round((start - zero) * 1000)
+            else:
+                self.shift[node] = 0
+            self._inflight[node] = collections.deque()
+        self.clock.start(at=start)
+
+    def play(self, events, nodes, verbose=False):
+        # Without a window nodes act on arrival, so a shared frame would
+        # play its later events early; events at the same time still share
+        quantum = self.quantum if self.window else 0
+        merge = MergeScheduler(coalesce(events, quantum, self.max_frame), nodes)
+        syncs = {node.master.sync for node in merge.nodes} - {None}
+        for sync in syncs:
+            sync.subscribe(merge.refresh)
+        try:
+            self.start(merge.nodes)
+            for at, frame in merge:
+                self.send(frame, at, verbose)
+        finally:
+            for sync in syncs:
+                sync.unsubscribe(merge.refresh)
+
+    def send(self, frame, at=None, verbose=False):
+        # `at` is when the frame should leave, in score seconds; by default
+        # its score time less the node's offset
+        clock = self.clock
+        node = frame.node
+        requested = self._requested[node]
+        due = frame.time / 1000 - requested
+        if at is None:
+            at = due - node.latency
+        clock.wait_until(at - self.window)
+
+        inflight = self._inflight[node]
+        now = clock.now()
+        while inflight and inflight[0] <= now:
+            inflight.popleft()
+        while len(inflight) > self.depth - len(frame.events):
+            # The node is full; wait for its oldest event to fire
+            clock.wait_until(inflight.popleft())
+
+        cmds = []
+        priority = G6_PRIORITY_LIGHT
+        for event in frame.events:
+            if event.cmd != G6_CMD_GRAPHENE_LIGHT:
+                priority = G6_PRIORITY_NOTE
+            stamp = event.time
+            if self.window:
+                stamp = max(0, stamp - round(requested * 1000) + self.shift[node])
+            cmds.append((event.cmd, stamp, event.channel, event.a, event.b))
+            inflight.append(event.time / 1000 - requested)
+            if verbose:
+                print(event)
+
+        if len(cmds) == 1:
+            node.send_event(*cmds[0], priority)
+        else:
+            node.send(*((cmd, struct.pack("<IBBB", *args)) for cmd, *args in cmds), priority=priority)
+
+        # How far behind its send slot this frame was handed to the bus
+        lateness = clock.now() - (at - self.window)
+        node.master.stats.record("lateness", max(0, int(lateness * 1e9)), node.handle)
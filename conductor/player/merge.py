@@ -0,0 +1,90 @@
+import collections
+import heapq
+import threading
+
+from g6 import G6Node
+
+
+class MergeScheduler:
+    """
+    Orders score events by when they must leave the host rather than when
+    they sound: each event is moved earlier by its node's offset, the
+    instrument's requested lead plus the measured bus latency. Every node
+    keeps its own queue and only its head sits in a heap, so when a node's
+    latency estimate changes only that one entry is redone.
+
+    Iterating yields (send_at, event), with send_at in score seconds.
+    """
+
+    def __init__(self, events, nodes=None):
+        self._queues: dict[G6Node, collections.deque] = collections.defaultdict(collections.deque)
+        for event in events:
+            self._queues[event.node].append(event)
+        for node in nodes or ():
+            self._queues.setdefault(node, collections.deque())
+
+        # The requested part of node.offset comes from the feature bytes and
+        # never changes, so work it out once
+        self._requested = {node: node.offset - node.latency for node in self._queues}
+        self._lead = {node: self._requested[node] + node.latency for node in self._queues}
+        self._version = dict.fromkeys(self._queues, 0)
+        self._heap = []
+        self._seq = 0
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+        for node in self._queues:
+            self._push(node)
+
+    @property
+    def nodes(self):
+        return list(self._queues)
+
+    def __len__(self):
+        return sum(len(i) for i in self._queues.values())
+
+    def lead(self, node):
+        return self._lead[node]
+
+    def requested(self, node):
+        return self._requested[node]
+
+    def refresh(self, node, *_):
+        # Safe to call from another thread, such as a G6ClockSync listener
+        with self._lock:
+            self._dirty.add(node)
+
+    def _push(self, node):
+        queue = self._queues[node]
+        if queue:
+            self._seq += 1
+            at = queue[0].time / 1000 - self._lead[node]
+            heapq.heappush(self._heap, (at, self._seq, node, self._version[node]))
+
+    def _apply_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for node in dirty:
+            if node not in self._queues:
+                continue
+            lead = self._requested[node] + node.latency
+            if lead == self._lead[node]:
+                continue
+            self._lead[node] = lead
+            # Whatever entry the node has in the heap is now stale
+            self._version[node] += 1
+            self._push(node)
+
+    def __iter__(self):
+        heap = self._heap
+        while True:
+            if self._dirty:
+                self._apply_dirty()
+            if not heap:
+                return
+            at, _, node, version = heapq.heappop(heap)
+            if version != self._version[node]:
+                continue
+            event = self._queues[node].popleft()
+            self._push(node)
+            yield at, event
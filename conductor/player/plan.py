@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+from g6.const import (
+    G6_SYNC, G6_CMD_GRAPHENE_LIGHT, G6_PRIORITY_NOTE, G6_PRIORITY_LIGHT, G6_LOOKAHEAD_WINDOW,
+    G6_NODE_EVENT_BUFFER, G6_PLAN_CACHE, G6_COALESCE_QUANTUM, G6_COALESCE_MAX_FRAME
+)
+from g6.packet import G6PacketOut, G6EventEncoder, escape, unescape
+
+from .coalesce import coalesce
+from .events import parse_midi, score_events
+from .lookahead import LookaheadPlayer
+from .routing import Router
+
+
+# Bump whenever the file layout or what gets baked into it changes
+PLAN_VERSION = 8
+_MAGIC = b"G6PLAN\n"
+_STAMPED = struct.Struct("<IBBB")
+
+
+class PerformancePlan:
+    """
+    A score compiled against one topology: every frame already encoded and
+    stamped, laid out back to back in `frames`, in the order it leaves the
+    host. Entry i is frames[offsets[i]:offsets[i + 1]], sent to node
+    handles[node[i]] at `times[i]` ns after `origin` on the playback clock.
+
+    Sends are planned as LookaheadPlayer would, `window` ahead, nearby
+    events for a node coalesced into one frame, and no more than `depth`
+    unfired events per node, except that bus latency is left out: it is
+    taken off at play time, so plans stay valid as latencies drift. Stamps
+    assume node clocks are zeroed one window before the score starts, which
+    LookaheadPlayer.start() sees to as closely as it can; sends() moves a
+    node's stamps by however far from that its clock was measured to be.
+
+    A plan can be compiled to start `base` ms into a longer performance,
+    such as a playlist, with `end` where the score ends on that timeline.
+    `tails` holds, per node handle, when its last `depth` events fire (ns),
+    for the plan that follows to count as still in flight.
+    """
+
+    def __init__(
+        self, handles, times, node, priority, offsets, frames, origin, window, depth, base=0, end=0,
+        tails=None
+    ):
+        self.handles: list[int] = handles
+        self.times: array = times
+        self.node: array = node
+        self.priority: array = priority
+        self.offsets: array = offsets
+        self.frames: bytearray = frames
+        self.origin = origin
+        self.window = window
+        self.depth = depth
+        self.base = base
+        self.end = end
+        self.tails: dict[int, list[int]] = tails or {}
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def compile(
+        cls, events, window=G6_LOOKAHEAD_WINDOW, depth=G6_NODE_EVENT_BUFFER,
+        quantum=G6_COALESCE_QUANTUM, max_frame=G6_COALESCE_MAX_FRAME, base=0, length=None, carry=None
+    ):
+        # `length` is the score's length in ms, by default up to its last
+        # event, and `carry` the tails of the plan this one follows
+        carry = carry or {}
+        encoder = G6EventEncoder()
+        index = {}
+        dues: dict[int, list] = {}
+        entries = []
+        end = base
+        # Without a window nodes act on arrival, so a shared frame would
+        # play its later events early; events at the same time still share
+        for group in coalesce(events, quantum if window else 0, max_frame):
+            node = group.node
+            i = index.get(node)
+            if i is None:
+                i = index[node] = len(index)
+                dues[i] = list(carry.get(node.handle, ()))
+            requested = node.offset - node.latency
+            send = round(((group.time + base) / 1000 - requested - window) * 1e9)
+
+            # Hold the send back until the node has room for the whole frame
+            node_dues = dues[i]
+            full = len(node_dues) + len(group) - 1 - depth
+            if full >= 0:
+                send = max(send, node_dues[full])
+
+            cmds = []
+            priority = G6_PRIORITY_LIGHT
+            for event in group.events:
+                if event.cmd != G6_CMD_GRAPHENE_LIGHT:
+                    priority = G6_PRIORITY_NOTE
+                stamp = event.time + base
+                end = max(end, stamp)
+                if window:
+                    stamp = max(0, stamp - round(requested * 1000) + round(window * 1000))
+                cmds.append((event.cmd, stamp, event.channel, event.a, event.b))
+                node_dues.append(round(((event.time + base) / 1000 - requested) * 1e9))
+
+            if len(cmds) == 1:
+                frame = bytes(encoder.encode(node.address, *cmds[0]))
+            else:
+                frame = bytes(G6PacketOut(
+                    node.address, *((cmd, struct.pack("<IBBB", *args)) for cmd, *args in cmds)
+                ))
+            entries.append((send, len(entries), i, priority, frame))
+
+        # Holding sends back can move them past other nodes' events
+        entries.sort()
+        origin = entries[0][0] if entries else 0
+
+        times = array("Q")
+        node = array("H")
+        priorities = array("B")
+        offsets = array("I", [0])
+        frames = bytearray()
+        for send, _, i, priority, frame in entries:
+            times.append(send - origin)
+            node.append(i)
+            priorities.append(priority)
+            frames += frame
+            offsets.append(len(frames))
+
+        handles = [None] * len(index)
+        tails = dict(carry)
+        for n, i in index.items():
+            handles[i] = n.handle
+            tails[n.handle] = dues[i][-depth:]
+        if length is not None:
+            end = base + length
+        return cls(handles, times, node, priorities, offsets, frames, origin, window, depth, base, end, tails)
+
+    def save(self, path):
+        header = {
+            "version": PLAN_VERSION,
+            "byteorder": sys.byteorder,
+            "handles": self.handles,
+            "count": len(self.times),
+            "size": len(self.frames),
+            "origin": self.origin,
+            "window": self.window,
+            "depth": self.depth,
+            "base": self.base,
+            "end": self.end,
+            "tails": list(self.tails.items()),
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(json.dumps(header).encode() + b"\n")
+            for arr in (self.times, self.node, self.priority, self.offsets):
+                arr.tofile(f)
+            f.write(self.frames)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        # A missing, stale or damaged plan is just a cache miss
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != _MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                if header["version"] != PLAN_VERSION or header["byteorder"] != sys.byteorder:
+                    return None
+                count = header["count"]
+                arrays = []
+                for code, n in (("Q", count), ("H", count), ("B", count), ("I", count + 1)):
+                    arr = array(code)
+                    arr.fromfile(f, n)
+                    arrays.append(arr)
+                frames = bytearray(f.read())
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+        if len(frames) != header["size"]:
+            return None
+        return cls(
+            header["handles"], *arrays, frames, header["origin"], header["window"], header["depth"],
+            header["base"], header["end"], dict((handle, tail) for handle, tail in header["tails"])
+        )
+
+    def sends(self, g6, shift=None):
+        # (clock ns, node, frame, priority) for every entry, in the order
+        # they leave. `shift` is LookaheadPlayer.shift, as measured when the
+        # node clocks were zeroed. Unless a node's is off from the window,
+        # nothing here parses or encodes; it hands over slices.
+        by_handle = {node.handle: node for node in g6.nodes}
+        nodes = [by_handle[i] for i in self.handles]
+        if any(node.master.reliable is not None for node in nodes):
+            print("W: Precompiled plans bypass the reliable link")
+
+        latency = [int(node.latency * 1e9) for node in nodes]
+        expected = round(self.window * 1000)
+        delta = [
+            shift[node] - expected if self.window and shift and node in shift else 0 for node in nodes
+        ]
+        times, node_of, priorities, offsets = self.times, self.node, self.priority, self.offsets
+        frames = memoryview(self.frames)
+        origin = self.origin
+        for i in range(len(times)):
+            n = node_of[i]
+            frame = frames[offsets[i]:offsets[i + 1]]
+            if delta[n]:
+                frame = restamp(frame, delta[n])
+            yield origin + times[i] - latency[n], nodes[n], frame, priorities[i]
+
+    def play(self, g6, verbose=False, start=True):
+        # With start=False the clocks are left as they are, for a plan that
+        # carries on from one already playing
+        clock = g6.clock
+        shift = None
+        if start:
+            by_handle = {node.handle: node for node in g6.nodes}
+            player = LookaheadPlayer(clock, self.window, self.depth)
+            player.start([by_handle[i] for i in self.handles])
+            shift = player.shift
+        for at, node, frame, priority in self.sends(g6, shift):
+            send_at(clock, at, node, frame, priority, verbose)
+
+
+def restamp(frame, delta):
+    # The frame with `delta` ms added to every command's stamp. Plans only
+    # hold <IBBB commands.
+    body = unescape(bytes(frame[1:]))
+    for pos in range(2, len(body) - 1, 1 + _STAMPED.size):
+        stamp, *rest = _STAMPED.unpack_from(body, pos + 1)
+        _STAMPED.pack_into(body, pos + 1, max(0, stamp + delta), *rest)
+    body[-1] = sum(body[:-1]) % 256
+    return memoryview(bytes([G6_SYNC]) + escape(body))
+
+
+def send_at(clock, at, node, frame, priority, verbose=False):
+    # Wait for `at` (clock ns) and hand the frame to the bus
+    late = clock.wait_until_ns(at)
+    node.master.submit(node.address, frame, priority)
+    node.master.stats.record("lateness", max(0, late), node.handle)
+    if verbose:
+        print(f"{(at + int(node.latency * 1e9)) / 1e9:8.3f}s -> {node.name}: {bytes(frame).hex()}")
+
+
+def plan_key(data: bytes, nodes, *params):
+    # The score, and everything about the topology a plan bakes in
+    h = hashlib.sha256(data)
+    for node in sorted(nodes, key=lambda i: i.handle):
+        h.update(f"{node.handle}:{node.ioident}:{bytes(node.features).hex()}\n".encode())
+    h.update(f"{params}:{PLAN_VERSION}".encode())
+    return h.hexdigest()
+
+
+def load_or_compile(
+    filename, g6, window=G6_LOOKAHEAD_WINDOW, depth=G6_NODE_EVENT_BUFFER,
+    quantum=G6_COALESCE_QUANTUM, max_frame=G6_COALESCE_MAX_FRAME, cache=G6_PLAN_CACHE, base=0,
+    carry=None
+):
+    return plan_file(filename, g6.nodes, window, depth, quantum, max_frame, cache, base, carry)[0]
+
+
+def plan_file(filename, nodes, window, depth, quantum, max_frame, cache, base=0, carry=None):
+    # load_or_compile() for a bare list of nodes, which also says where the
+    # plan is cached (None if it isn't)
+    with open(filename, "rb") as midifile:
+        data = midifile.read()
+
+    path = None
+    if cache is not None:
+        params = (window, depth, quantum, max_frame, base, sorted((carry or {}).items()))
+        path = os.path.join(cache, plan_key(data, nodes, *params) + ".plan")
+        plan = PerformancePlan.load(path)
+        if plan is not None:
+            return plan, path
+
+    tracks, mixer = parse_midi(data)
+    length = mixer.length()
+    router = Router(nodes)
+    mappings = router.map_tracks(tracks)
+    plan = PerformancePlan.compile(
+        score_events(mixer, mappings, router), window, depth, quantum, max_frame, base, length, carry
+    )
+    if path is not None:
+        os.makedirs(cache, exist_ok=True)
+        plan.save(path)
+    return plan, path
@@ -0,0 +1,137 @@
+import collections
+import concurrent.futures
+import heapq
+import multiprocessing
+import tempfile
+
+from g6.const import (
+    G6_LOOKAHEAD_WINDOW, G6_NODE_EVENT_BUFFER, G6_PLAN_CACHE, G6_PLAYLIST_GAP,
+    G6_COALESCE_QUANTUM, G6_COALESCE_MAX_FRAME
+)
+from g6.topology import node_from_dict, node_to_dict
+
+from .lookahead import LookaheadPlayer
+from .plan import PerformancePlan, plan_file, send_at
+
+
+def _compile(filename, topology, window, depth, cache, base, carry):
+    # Runs in a worker process, away from the playback loop. It has no bus,
+    # so nodes are rebuilt from their topology entries, and the plan comes
+    # back through the cache.
+    nodes = []
+    for handle, entry in topology:
+        node = node_from_dict(None, entry)
+        node.handle = handle
+        nodes.append(node)
+    return plan_file(
+        filename, nodes, window, depth, G6_COALESCE_QUANTUM, G6_COALESCE_MAX_FRAME, cache, base, carry
+    )[1]
+
+
+class Playlist:
+    """
+    Plays pieces back to back in one bus session. Node clocks are zeroed
+    once, and each piece is compiled to start where the one before it ends
+    (plus `gap` ms), counting the frames it still has in flight, so the
+    boundary is as exact as any two notes within a piece. Every piece's
+    sends go through one timeline, so the next piece's first frames leave
+    as early as they need to, even before the last ones of the piece before
+    it. The next piece is loaded and compiled in a worker process while the
+    current one plays. Pieces can be added while it is playing.
+    """
+
+    def __init__(
+        self, g6, files=(), window=G6_LOOKAHEAD_WINDOW, depth=G6_NODE_EVENT_BUFFER,
+        gap=G6_PLAYLIST_GAP, cache=G6_PLAN_CACHE
+    ):
+        self.g6 = g6
+        self.window = window
+        self.depth = depth
+        self.gap = gap
+        self.cache = cache
+        self._queue = collections.deque(files)
+
+    def add(self, filename):
+        self._queue.append(filename)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def play(self, verbose=False):
+        if not self._queue:
+            return
+        if self.cache is not None:
+            self._play(self.cache, verbose)
+            return
+        # Plans still need somewhere to come back through
+        with tempfile.TemporaryDirectory() as cache:
+            self._play(cache, verbose)
+
+    def _play(self, cache, verbose):
+        g6 = self.g6
+        clock = g6.clock
+        topology = [(node.handle, node_to_dict(node)) for node in g6.nodes]
+        # The earliest any piece sends ahead of where it starts
+        lead = self.window + max((node.offset - node.latency for node in g6.nodes), default=0.0)
+        lead += max((node.latency for node in g6.nodes), default=0.0)
+
+        filename = self._queue.popleft()
+        plan = plan_file(
+            filename, g6.nodes, self.window, self.depth, G6_COALESCE_QUANTUM, G6_COALESCE_MAX_FRAME, cache
+        )[0]
+        # Every piece's stamps are moved by how far off the clocks were zeroed
+        player = LookaheadPlayer(clock, self.window, self.depth)
+        player.start(g6.nodes)
+        shift = player.shift
+
+        # Each piece's next send: (clock ns, seq, node, frame, priority,
+        # the rest of its sends, the piece's name on its first send)
+        timeline = []
+        seq = 0
+
+        def push(sends, piece=None):
+            nonlocal seq
+            for entry in sends:
+                seq += 1
+                heapq.heappush(timeline, (entry[0], seq, *entry[1:], sends, piece))
+                return
+
+        push(plan.sends(g6, shift), filename)
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            pending = None
+            while True:
+                if pending is None and self._queue:
+                    filename = self._queue.popleft()
+                    base = plan.end + self.gap
+                    future = pool.submit(
+                        _compile, filename, topology, self.window, self.depth, cache, base, plan.tails
+                    )
+                    pending = (filename, future, int((base / 1000 - lead) * 1e9), base, plan.tails)
+
+                if pending is not None:
+                    filename, future, due, base, carry = pending
+                    if future.done() or not timeline or timeline[0][0] >= due:
+                        plan = PerformancePlan.load(future.result())
+                        pending = None
+                        if plan is None:
+                            # Gone or damaged on the way back; compile it here
+                            print(f"W: Plan for {filename} did not come back, compiling it again")
+                            plan = plan_file(
+                                filename, g6.nodes, self.window, self.depth, G6_COALESCE_QUANTUM,
+                                G6_COALESCE_MAX_FRAME, None, base, carry
+                            )[0]
+                        # It should be ready before its first send is due
+                        late = clock.now() - plan.origin / 1e9
+                        if late > 0:
+                            print(f"W: {filename} was ready {late * 1000:.0f}ms late")
+                        push(plan.sends(g6, shift), filename)
+                        continue
+
+                if not timeline:
+                    return
+                at, _, node, frame, priority, sends, piece = heapq.heappop(timeline)
+                if piece is not None:
+                    print(f"Playing {piece}")
+                send_at(clock, at, node, frame, priority, verbose)
+                push(sends)
@@ -0,0 +1,155 @@
+import collections
+
+from g6 import G6Node
+from g6.const import G6_POLYPHONY
+
+
+class Voice:
+    """
+    One note that a node can sound at a time on one of its note channels;
+    a channel has as many voices as its instrument's polyphony. `channel`
+    is None for a node that describes no note channels, which is sent
+    whatever MIDI channel the note came in on, as before routing existed.
+    """
+
+    __slots__ = ("node", "channel", "low", "high", "note", "serial")
+
+    def __init__(self, node: G6Node, channel, low, high):
+        self.node = node
+        self.channel = channel
+        self.low = low
+        self.high = high
+        # What the voice is playing, and how many notes it has been given
+        self.note = None
+        self.serial = 0
+
+    def __repr__(self):
+        return f"<Voice {self.node.name}@{self.node.handle} ch={self.channel} {self.low}-{self.high}>"
+
+
+class VoicePool:
+    """
+    Every voice of the instruments sharing one name, such as two "Musical
+    Steppers" boards with four voices each. For each note the pool already
+    knows which ranges cover it, and voices with the same range share an
+    idle queue, so handing out a voice is a couple of deque operations. When
+    all are busy the longest-held voice is taken over.
+    """
+
+    def __init__(self, name, voices):
+        self.name = name
+        self.voices: list[Voice] = voices
+
+        classes = collections.defaultdict(list)
+        for voice in voices:
+            classes[voice.low, voice.high].append(voice)
+        self._idle = {key: collections.deque(i) for key, i in classes.items()}
+        self._busy = {key: collections.deque() for key in classes}
+        # Note -> the ranges that can play it, and a bitmap of playable notes
+        self._ranges = [
+            tuple(key for key in classes if key[0] <= note <= key[1]) for note in range(128)
+        ]
+        self.playable = 0
+        for note, ranges in enumerate(self._ranges):
+            if ranges:
+                self.playable |= 1 << note
+
+    def can_play(self, note):
+        return self.playable >> note & 1
+
+    def reset(self):
+        for key, idle in self._idle.items():
+            idle.clear()
+            self._busy[key].clear()
+        for voice in self.voices:
+            voice.note = None
+            self._idle[voice.low, voice.high].append(voice)
+
+    def allocate(self, note):
+        # Returns (voice, serial, note it was taken from or None)
+        ranges = self._ranges[note]
+        for key in ranges:
+            idle = self._idle[key]
+            if idle:
+                return self._assign(idle.popleft(), key, note) + (None,)
+
+        # Every voice that can play the note is busy; steal the oldest
+        busy = self._busy[ranges[0]]
+        while True:
+            voice, serial = busy.popleft()
+            if voice.serial == serial and voice.note is not None:
+                break
+        stolen = voice.note
+        return self._assign(voice, ranges[0], note) + (stolen,)
+
+    def _assign(self, voice, key, note):
+        voice.serial += 1
+        voice.note = note
+        busy = self._busy[key]
+        busy.append((voice, voice.serial))
+        # Drop notes that have already ended off the front
+        while busy[0][0].serial != busy[0][1] or busy[0][0].note is None:
+            busy.popleft()
+        return voice, voice.serial
+
+    def release(self, voice, serial):
+        # A voice that has since been stolen is not ours to free
+        if voice.serial != serial or voice.note is None:
+            return False
+        voice.note = None
+        self._idle[voice.low, voice.high].append(voice)
+        return True
+
+
+class Router:
+    """
+    Routing index over an enumerated topology, built once: instrument name
+    to the VoicePool of every node carrying it. Tracks are mapped to pools
+    by name, and notes are handed voices as they start and give them back
+    as they end.
+    """
+
+    def __init__(self, nodes, polyphony=G6_POLYPHONY):
+        voices = collections.defaultdict(list)
+        for node in nodes:
+            channels = dict(node.channels) or {None: (0, 127)}
+            for channel, (low, high) in sorted(channels.items()):
+                # Unless known otherwise, every note in range can sound at once
+                count = polyphony.get(node.name, max(0, min(high, 127) - low + 1))
+                for _ in range(count):
+                    voices[node.name].append(Voice(node, channel, low, high))
+        self.pools = {name: VoicePool(name, i) for name, i in voices.items()}
+
+        # (track, MIDI channel, note) -> (voice, serial) of the sounding note
+        self._held = {}
+
+    def map_tracks(self, tracks):
+        # Each track goes to the instruments whose name matches the track's
+        mappings = {}
+        for (track, (name, channels)) in tracks.items():
+            pool = self.pools.get(name)
+            if pool is None:
+                print(f"Unable to allocate track: {name}")
+                continue
+            mappings[track] = pool
+        return mappings
+
+    def reset(self):
+        self._held.clear()
+        for pool in self.pools.values():
+            pool.reset()
+
+    def note_on(self, pool: VoicePool, key, note):
+        # Returns (voice, stolen note or None). Any note already sounding
+        # under the same key is let go first.
+        self.note_off(pool, key)
+        voice, serial, stolen = pool.allocate(note)
+        self._held[key] = (voice, serial)
+        return voice, stolen
+
+    def note_off(self, pool: VoicePool, key):
+        # The voice the note was playing on, or None if it had been stolen
+        held = self._held.pop(key, None)
+        if held is None or not pool.release(*held):
+            return None
+        return held[0]
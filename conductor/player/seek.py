@@ -0,0 +1,189 @@
+import bisect
+import struct
+
+from midiparse import MetaEventType, MidiEventType, MidiTrackEventType
+from g6.const import (
+    G6_CMD_GRAPHENE_DOWN, G6_CMD_GRAPHENE_UP, G6_CMD_GRAPHENE_LIGHT, G6_CMD_GRAPHENE_CONTROL,
+    G6_PRIORITY_NOTE, G6_REPORT_OK, G6_LOOKAHEAD_WINDOW, G6_SEEK_INTERVAL
+)
+
+from .coalesce import split_frames
+from .events import parse_midi, score_events
+from .lookahead import LookaheadPlayer
+from .routing import Router
+
+
+# MIDI's default tempo, in us per quarter note
+_DEFAULT_TEMPO = 500000
+
+
+class ChaseState:
+    """
+    Everything that holds at a point in a score, as opposed to happening at
+    it: tempo, program and controller values per (track, channel), and the
+    notes sounding as (track, channel, note) -> velocity.
+    """
+
+    __slots__ = ("tempo", "programs", "controllers", "sounding")
+
+    def __init__(self, tempo=_DEFAULT_TEMPO, programs=None, controllers=None, sounding=None):
+        self.tempo = tempo
+        self.programs = dict(programs or {})
+        self.controllers = dict(controllers or {})
+        self.sounding = dict(sounding or {})
+
+    def copy(self):
+        return ChaseState(self.tempo, self.programs, self.controllers, self.sounding)
+
+    def apply(self, evt):
+        if evt.track_ev_type == MidiTrackEventType.Meta:
+            if evt.track_ev.ev_type == MetaEventType.Tempo:
+                self.tempo = evt.track_ev.tag
+            return
+        if evt.track_ev_type != MidiTrackEventType.Midi:
+            return
+
+        track_ev = evt.track_ev
+        ev_type = track_ev.ev_type
+        if ev_type == MidiEventType.NoteOn or ev_type == MidiEventType.NoteOff:
+            note, vel = track_ev.tag
+            key = (evt.track, track_ev.channel, note)
+            if ev_type == MidiEventType.NoteOn and vel:
+                self.sounding[key] = vel
+            else:
+                self.sounding.pop(key, None)
+        elif ev_type == MidiEventType.ProgramChange:
+            self.programs[evt.track, track_ev.channel] = track_ev.tag
+        elif ev_type == MidiEventType.ControllerChange:
+            controller, value = track_ev.tag
+            self.controllers[evt.track, track_ev.channel, controller] = value
+
+    def __repr__(self):
+        return (
+            f"<ChaseState {60e6 / self.tempo:.1f}bpm programs={len(self.programs)} "
+            f"controllers={len(self.controllers)} sounding={len(self.sounding)}>"
+        )
+
+
+class SeekIndex:
+    """
+    Time index over a mixed MIDI stream, built in one pass. Every `interval`
+    ms a checkpoint keeps the stream position and a ChaseState, so seeking
+    bisects the checkpoints and replays at most one interval of events
+    from there.
+    """
+
+    def __init__(self, mixer, interval=G6_SEEK_INTERVAL):
+        self.interval = interval
+        self.events = list(mixer)
+
+        self._times = []
+        self._checkpoints = []
+        state = ChaseState()
+        for i, (timestamp, evt) in enumerate(self.events):
+            while len(self._times) * interval <= timestamp:
+                # The state in force as this interval begins
+                self._times.append(len(self._times) * interval)
+                self._checkpoints.append((i, state.copy()))
+            state.apply(evt)
+
+    @property
+    def length(self):
+        return self.events[-1][0] if self.events else 0
+
+    def seek(self, at):
+        # First event at or after `at`, and the state just before it
+        if not self._checkpoints:
+            return len(self.events), ChaseState()
+        n = bisect.bisect_right(self._times, at) - 1
+        i, state = self._checkpoints[max(0, n)]
+        state = state.copy()
+        events = self.events
+        while i < len(events) and events[i][0] < at:
+            state.apply(events[i][1])
+            i += 1
+        return i, state
+
+    def replay(self, position, at=0):
+        # The stream from `position` on, with times counted from `at`
+        for timestamp, evt in self.events[position:]:
+            yield timestamp - at, evt
+
+
+def chase(state: ChaseState, mappings, router: Router):
+    """
+    The commands that put every node where the score would have it, per
+    node: controller values for control channels the node has, then every
+    sounding note, lit and struck. Sounding notes are given voices from
+    `router`, so their note offs find them later.
+    """
+    cmds = {}
+    for (track, channel, controller), value in state.controllers.items():
+        pool = mappings.get(track)
+        if pool is None:
+            continue
+        for node in {i.node for i in pool.voices}:
+            if channel in node.contorl_channels:
+                cmds.setdefault(node, []).append(
+                    (G6_CMD_GRAPHENE_CONTROL, struct.pack("<IBBB", 0, channel, controller, value))
+                )
+
+    for (track, channel, note), vel in state.sounding.items():
+        pool = mappings.get(track)
+        if pool is None or not pool.can_play(note):
+            continue
+        voice, stolen = router.note_on(pool, (track, channel, note), note)
+        ch = channel if voice.channel is None else voice.channel
+        node_cmds = cmds.setdefault(voice.node, [])
+        if stolen is not None:
+            # More notes held than voices; the last ones chased win
+            node_cmds.extend((
+                (G6_CMD_GRAPHENE_LIGHT, struct.pack("<IBBB", 0, ch, stolen, 0)),
+                (G6_CMD_GRAPHENE_UP, struct.pack("<IBBB", 0, ch, stolen, 0)),
+            ))
+        node_cmds.extend((
+            (G6_CMD_GRAPHENE_LIGHT, struct.pack("<IBBB", 0, ch, note, 255)),
+            (G6_CMD_GRAPHENE_DOWN, struct.pack("<IBBB", 0, ch, note, vel)),
+        ))
+    return cmds
+
+
+class SeekPlayer:
+    """
+    Plays one piece from any point, for rehearsals and restarts. The file
+    is parsed and indexed once; each play() seeks in O(log n), chases the
+    state there onto the nodes, then streams the rest through a
+    LookaheadPlayer.
+    """
+
+    def __init__(self, g6, filename, window=G6_LOOKAHEAD_WINDOW, interval=G6_SEEK_INTERVAL):
+        self.g6 = g6
+        self.window = window
+
+        with open(filename, "rb") as midifile:
+            tracks, mixer = parse_midi(midifile.read())
+        self.router = Router(g6.nodes)
+        self.mappings = self.router.map_tracks(tracks)
+        self.index = SeekIndex(mixer, interval)
+
+    def play(self, at=0, verbose=False):
+        position, state = self.index.seek(at)
+        if verbose:
+            print(f"Resuming at {at}ms: {state}")
+
+        self.router.reset()
+        for node, cmds in chase(state, self.mappings, self.router).items():
+            # Stamped 0 they act on arrival, ahead of anything that follows.
+            # Split as coalesced frames are, so they fit the bridge.
+            for chunk in split_frames(cmds):
+                if not any(cmd == G6_CMD_GRAPHENE_CONTROL for cmd, _ in chunk):
+                    node.send(*chunk, priority=G6_PRIORITY_NOTE)
+                    continue
+                # Controls are answered, so this one is an exchange
+                response = node.exchange(*chunk)
+                if any(report != G6_REPORT_OK for report in response.data):
+                    print(f"W: {node.name} refused some chased controls")
+
+        events = score_events(self.index.replay(position, at), self.mappings, self.router, reset=False)
+        nodes = {i.node for pool in self.mappings.values() for i in pool.voices}
+        LookaheadPlayer(self.g6.clock, self.window).play(events, nodes, verbose)